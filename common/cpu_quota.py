@@ -0,0 +1,32 @@
+# cpu_quota.py
+"""
+CPUs a container may use, for sizing worker pools and thread counts.
+
+A pod's CPU limit is enforced by the CFS quota of its cgroup, not by the set
+of cores the process can see: `os.cpu_count()` and the affinity mask report
+the whole node. Oversizing a pool past the quota only adds throttling.
+"""
+import math
+import os
+
+
+def cpu_quota() -> int:
+    """CPUs available to this container: cgroup quota, else affinity count."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                return max(1, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+    return len(os.sched_getaffinity(0))
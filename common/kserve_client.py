@@ -0,0 +1,155 @@
+# kserve_client.py
+"""
+Shared HTTP client for the frontends that call KServe predictors
+(kserve/iris/frontend, kserve-diabetes-mini-project/inference/frontend,
+insurance-fraud-project/frontend).
+
+  * one process-wide requests.Session with a keep-alive connection pool, so
+    calls reuse TCP/TLS connections instead of handshaking every time
+  * a semaphore bounding concurrent in-flight calls from this process
+  * retries with exponential backoff and full jitter on 502/503/504 and
+    connection errors (Knative answers 503 while a predictor scales up),
+    within a total time budget; a read timeout is never retried, the
+    predictor may still be working on the request
+  * per-endpoint latency histograms, see `stats()`
+
+`post()` takes the same arguments as `requests.post`, so call sites only swap
+the module they call.
+
+Tuning via env:
+    KSERVE_POOL_SIZE        connections kept per host           (default 20)
+    KSERVE_MAX_CONCURRENCY  concurrent calls per process        (default 8)
+    KSERVE_MAX_RETRIES      retries after the first attempt     (default 5)
+    KSERVE_BACKOFF_BASE     first backoff ceiling, seconds      (default 0.2)
+    KSERVE_BACKOFF_MAX      backoff ceiling cap, seconds        (default 5)
+    KSERVE_RETRY_BUDGET     no retry starts after this many     (default 15)
+                            seconds since the first attempt
+"""
+import bisect
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE       = int(os.getenv("KSERVE_POOL_SIZE", "20"))
+MAX_CONCURRENCY = int(os.getenv("KSERVE_MAX_CONCURRENCY", "8"))
+MAX_RETRIES     = int(os.getenv("KSERVE_MAX_RETRIES", "5"))
+BACKOFF_BASE    = float(os.getenv("KSERVE_BACKOFF_BASE", "0.2"))
+BACKOFF_MAX     = float(os.getenv("KSERVE_BACKOFF_MAX", "5"))
+RETRY_BUDGET    = float(os.getenv("KSERVE_RETRY_BUDGET", "15"))
+RETRY_STATUSES  = (502, 503, 504)
+
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+_lock = threading.Lock()
+_session = None
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_stats = {}
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.calls = self.errors = self.retries = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.calls += 1
+        self.sum_ms += ms
+
+
+def _endpoint(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def _record(endpoint, ms=None, retried=False, failed=False):
+    with _lock:
+        st = _stats.setdefault(endpoint, _EndpointStats())
+        if ms is not None:
+            st.observe(ms)
+        st.retries += int(retried)
+        st.errors += int(failed)
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter: uniform(0, min(cap, base * 2^attempt))
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    endpoint = _endpoint(url)
+    session = get_session()
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        with _slots:
+            t0 = time.perf_counter()
+            try:
+                resp = session.request(method, url, **kwargs)
+                err = None
+            except requests.ConnectionError as e:
+                # includes ConnectTimeout; a ReadTimeout is not a ConnectionError
+                # and propagates at once
+                resp, err = None, e
+            except requests.Timeout:
+                _record(endpoint, (time.perf_counter() - t0) * 1000.0, failed=True)
+                raise
+            _record(endpoint, (time.perf_counter() - t0) * 1000.0)
+        retryable = err is not None or resp.status_code in RETRY_STATUSES
+        delay = _backoff(attempt)
+        if not retryable or attempt >= MAX_RETRIES \
+                or time.perf_counter() + delay - start > RETRY_BUDGET:
+            if err is not None:
+                _record(endpoint, failed=True)
+                raise err
+            if resp.status_code >= 400:
+                _record(endpoint, failed=True)
+            return resp
+        _record(endpoint, retried=True)
+        time.sleep(delay)   # outside the semaphore
+        attempt += 1
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def stats() -> dict:
+    """Per-endpoint call/retry/error counts and cumulative latency buckets (ms)."""
+    out = {}
+    with _lock:
+        for endpoint, st in _stats.items():
+            buckets, running = {}, 0
+            for le, c in zip(LATENCY_BUCKETS_MS + ["+Inf"], st.counts):
+                running += c
+                buckets[str(le)] = running
+            out[endpoint] = {
+                "calls": st.calls,
+                "retries": st.retries,
+                "errors": st.errors,
+                "mean_ms": st.sum_ms / st.calls if st.calls else 0.0,
+                "latency_ms_buckets": buckets,
+            }
+    return out
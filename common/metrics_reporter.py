@@ -0,0 +1,156 @@
+# metrics_reporter.py
+"""
+Background Pushgateway reporter for training jobs (katib/katib-prometheus,
+katib/train.py, insurance-fraud-project/train.py, ...).
+
+Metrics are set as they happen during the run and pushed from a daemon thread
+every `interval` seconds, so a Grafana panel shows a trial's progress while
+it is still training and a slow Pushgateway never blocks the training loop:
+
+    reporter = MetricsReporter(os.environ.get("PUSHGATEWAY_ADDR", ""),
+                               job="katib_trial_metrics",
+                               grouping_key={"trial": trial_name})
+    with reporter.timer("fit_duration_seconds"):
+        model.fit(X, y)
+    reporter.set("score", 0.93, stage="3")      # one series per stage
+    reporter.close()                              # final push, bounded wait
+
+  * every push sends the whole registry (PUT), so the group always holds the
+    latest value of every series
+  * each push is retried `max_retries` times with exponential backoff; a push
+    that still fails is counted and dropped, the next interval tries again
+  * `peak_rss_bytes` (ru_maxrss) and `last_push_timestamp_seconds` are
+    refreshed on every push
+  * `close()` (also run at interpreter exit) stops the thread and makes one
+    last push, giving up after `flush_timeout` seconds
+
+With an empty gateway address the reporter is a no-op and prometheus_client
+is not imported.
+"""
+import atexit
+import logging
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+def peak_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class MetricsReporter:
+    def __init__(self, gateway: str, job: str, grouping_key=None, interval: float = 10.0,
+                 max_retries: int = 3, backoff: float = 0.5, push_timeout: float = 5.0,
+                 flush_timeout: float = 10.0):
+        self.gateway = gateway
+        self.job = job
+        self.grouping_key = dict(grouping_key or {})
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.push_timeout = push_timeout
+        self.flush_timeout = flush_timeout
+        self.pushes = self.failures = 0
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        if not gateway:
+            return
+
+        from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+        self._Gauge = Gauge
+        self._push_to_gateway = push_to_gateway
+        self.registry = CollectorRegistry()
+        self.set("peak_rss_bytes", peak_rss_bytes())
+        self._thread = threading.Thread(target=self._loop, name="metrics-reporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.gateway)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Set a gauge; keyword arguments become labels (one series per value)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._set_locked(name, value, labels)
+            self._dirty = True
+
+    def _set_locked(self, name, value, labels):
+        gauge = self._gauges.get(name)
+        if gauge is None:
+            gauge = self._Gauge(name, f"training metric {name}", sorted(labels),
+                                registry=self.registry)
+            self._gauges[name] = gauge
+        (gauge.labels(**labels) if labels else gauge).set(float(value))
+
+    def update(self, metrics: dict, **labels) -> None:
+        for name, value in metrics.items():
+            self.set(name, value, **labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Set `name` to the wall time of the block, in seconds."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.set(name, time.perf_counter() - t0, **labels)
+
+    def _push(self, deadline=None) -> bool:
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                # bookkeeping series; they don't make the registry dirty
+                self._set_locked("peak_rss_bytes", peak_rss_bytes(), {})
+                self._set_locked("last_push_timestamp_seconds", time.time(), {})
+                self._dirty = False
+            try:
+                self._push_to_gateway(self.gateway, job=self.job, registry=self.registry,
+                                      grouping_key=self.grouping_key, timeout=self.push_timeout)
+                self.pushes += 1
+                return True
+            except Exception as e:
+                delay = self.backoff * (2 ** attempt)
+                if attempt == self.max_retries or (deadline and time.monotonic() + delay > deadline):
+                    self.failures += 1
+                    log.warning("pushgateway %s: push failed (%s), dropped", self.gateway, e)
+                    with self._lock:
+                        self._dirty = True      # try again next interval
+                    return False
+                time.sleep(delay)
+        return False
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            if self._dirty:
+                self._push()
+
+    def push_now(self) -> bool:
+        """Push immediately from the caller's thread (e.g. at a stage boundary)."""
+        return self._push() if self.enabled else False
+
+    def close(self) -> None:
+        """Stop the background thread and make a final push, bounded by flush_timeout."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        self._stop.set()
+        deadline = time.monotonic() + self.flush_timeout
+        thread.join(timeout=self.flush_timeout)
+        # the final push runs in a helper thread so a hung gateway can't block exit
+        final = threading.Thread(target=self._push, args=(deadline,), daemon=True)
+        final.start()
+        final.join(timeout=max(0.0, deadline - time.monotonic()))
+        if final.is_alive():
+            log.warning("pushgateway %s: final push still pending after %.0fs, giving up",
+                        self.gateway, self.flush_timeout)
@@ -0,0 +1,76 @@
+# v2_codec.py
+"""
+KServe / Open Inference Protocol V2 request and response codecs, JSON and
+binary tensor extension.
+
+Binary extension layout (both directions):
+
+    <JSON header><raw tensor bytes ...>
+    Inference-Header-Content-Length: <len(JSON header)>
+
+Each binary tensor is described in the JSON header with
+`"parameters": {"binary_data_size": <bytes>}` and no "data" field; its bytes
+follow the header in the order the tensors are listed, row-major and
+little-endian. Asking for binary outputs uses the request-level parameter
+`binary_data_output: true`.
+
+`encode_request` returns (body, headers) ready for `requests.post(data=...)`;
+`decode_response` accepts either a JSON or a binary response and returns the
+outputs with "data" as a NumPy array of the declared shape. Outputs of a
+datatype without a NumPy equivalent here (BYTES) are left undecoded: their
+JSON "data" as sent, or their raw binary bytes.
+"""
+import json
+
+import numpy as np
+
+HEADER_LENGTH = "Inference-Header-Content-Length"
+
+DTYPES = {
+    "BOOL": np.dtype("?"),
+    "UINT8": np.dtype("<u1"), "UINT16": np.dtype("<u2"),
+    "UINT32": np.dtype("<u4"), "UINT64": np.dtype("<u8"),
+    "INT8": np.dtype("<i1"), "INT16": np.dtype("<i2"),
+    "INT32": np.dtype("<i4"), "INT64": np.dtype("<i8"),
+    "FP16": np.dtype("<f2"), "FP32": np.dtype("<f4"), "FP64": np.dtype("<f8"),
+}
+
+
+def encode_request(name, array, datatype="FP32", binary=True):
+    """Body bytes and headers for a single-input V2 infer request."""
+    arr = np.ascontiguousarray(array, dtype=DTYPES[datatype])
+    tensor = {"name": name, "shape": list(arr.shape), "datatype": datatype}
+    if not binary:
+        tensor["data"] = arr.ravel().tolist()
+        body = json.dumps({"inputs": [tensor]}).encode()
+        return body, {"Content-Type": "application/json"}
+    raw = arr.tobytes()
+    tensor["parameters"] = {"binary_data_size": len(raw)}
+    header = json.dumps({"inputs": [tensor], "parameters": {"binary_data_output": True}}).encode()
+    headers = {"Content-Type": "application/octet-stream", HEADER_LENGTH: str(len(header))}
+    return header + raw, headers
+
+
+def decode_response(content: bytes, headers) -> dict:
+    """Parsed V2 response; every output's "data" becomes an ndarray."""
+    header_len = headers.get(HEADER_LENGTH)
+    if header_len is None:
+        result = json.loads(content)
+        offset, blob = 0, b""
+    else:
+        header_len = int(header_len)
+        result = json.loads(content[:header_len])
+        offset, blob = 0, content[header_len:]
+    for out in result.get("outputs", []):
+        dtype = DTYPES.get(out.get("datatype"))
+        size = (out.get("parameters") or {}).get("binary_data_size")
+        if size is not None:
+            if dtype is None:
+                out["data"] = blob[offset:offset + size]
+            else:
+                out["data"] = np.frombuffer(blob, dtype=dtype, count=size // dtype.itemsize,
+                                            offset=offset).reshape(out["shape"])
+            offset += size
+        elif "data" in out and dtype is not None:
+            out["data"] = np.asarray(out["data"], dtype=dtype).reshape(out["shape"])
+    return result
@@ -1,23 +1,203 @@
 #!/usr/bin/env python3
 import argparse
+import glob
+import hashlib
+import json
 import logging
+import os
+import sys
+import time
+
+import torch
 from transformers import (
     AutoModelForCausalLM,
     AutoTokenizer,
+    DataCollatorForLanguageModeling,
     Trainer,
-    TrainingArguments
+    TrainingArguments,
+    default_data_collator
 )
-from datasets import load_dataset
+from datasets import load_dataset, load_from_disk
+from filelock import FileLock
 from peft import LoraConfig, get_peft_model, TaskType
 
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from cpu_quota import cpu_quota  # noqa: E402
+
 logging.basicConfig(level=logging.INFO)
 
+def prepare_dataset(ds, tokenizer, mode, max_length):
+    """Tokenize every split for the chosen --data_mode."""
+    if mode == "max_length":
+        def tokenize(batch):
+            return tokenizer(
+                batch["text"],
+                truncation=True,
+                padding="max_length",
+                max_length=max_length
+            )
+        return ds.map(tokenize, batched=True, remove_columns=["text"])
+
+    if mode == "dynamic":
+        def tokenize(batch):
+            enc = tokenizer(batch["text"], truncation=True, max_length=max_length)
+            enc["length"] = [len(ids) for ids in enc["input_ids"]]
+            return enc
+        ds = ds.map(tokenize, batched=True, remove_columns=["text"])
+        # wikitext has many blank lines; they would be all-padding rows
+        return ds.filter(lambda ex: ex["length"] > 0)
+
+    # packed: one stream of tokens per map batch, cut into full blocks; the
+    # tail shorter than a block is dropped (as in HF's run_clm example)
+    eos = tokenizer.eos_token_id
+    def pack(batch):
+        stream = []
+        for ids in tokenizer(batch["text"])["input_ids"]:
+            if ids:
+                stream.extend(ids)
+                stream.append(eos)
+        n = len(stream) // max_length * max_length
+        blocks = [stream[i:i + max_length] for i in range(0, n, max_length)]
+        return {
+            "input_ids": blocks,
+            "attention_mask": [[1] * max_length for _ in blocks],
+            "labels": [list(b) for b in blocks],
+        }
+    return ds.map(pack, batched=True, remove_columns=["text"])
+
+def cpu_has_bf16():
+    # without avx512_bf16/amx the bf16 ops are emulated and slower than fp32
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+def cpu_perf_profile(args):
+    """
+    Apply --cpu_perf thread settings and return the TrainingArguments it
+    implies. Without the flag nothing changes (torch's defaults, which size
+    the thread pool by the host's cores rather than the pod's quota).
+    """
+    kwargs = {}
+    if args.cpu_perf:
+        cpus = cpu_quota()
+        torch.set_num_threads(cpus)
+        torch.set_num_interop_threads(1)
+        workers = min(2, cpus - 1)
+        bf16 = cpu_has_bf16()
+        kwargs.update(
+            use_cpu=True,
+            bf16=bf16,
+            dataloader_num_workers=workers,
+            # pinning only helps host->GPU copies; on CPU nodes prefetch does the work
+            dataloader_pin_memory=False,
+        )
+        if workers:
+            kwargs.update(dataloader_prefetch_factor=2, dataloader_persistent_workers=True)
+        logging.info("cpu_perf: %d threads (cgroup quota), bf16=%s, dataloader workers=%d",
+                     cpus, bf16, workers)
+    if args.torch_compile:
+        kwargs.update(torch_compile=True, torch_compile_backend="inductor")
+    # older transformers lack some of these fields; drop what it doesn't know
+    known = TrainingArguments.__dataclass_fields__
+    dropped = sorted(k for k in kwargs if k not in known)
+    if dropped:
+        logging.info("TrainingArguments has no %s, skipped", ", ".join(dropped))
+    return {k: v for k, v in kwargs.items() if k in known}
+
+# bump when prepare_dataset changes what it writes
+DATASET_CACHE_VERSION = 1
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def dataset_cache_key(tokenizer, data_files, mode, max_length):
+    """Hash of everything the tokenized dataset depends on."""
+    # the serialized fast tokenizer covers vocab, merges and normalizers, so a
+    # new revision of the same model name gets a new key
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    parts = {
+        "version": DATASET_CACHE_VERSION,
+        "tokenizer": tokenizer.name_or_path,
+        "tokenizer_sha256": hashlib.sha256(backend.to_str().encode()).hexdigest()
+                            if backend is not None else None,
+        "eos": tokenizer.eos_token_id,
+        "mode": mode,
+        "max_length": max_length,
+        # a path may be a glob over gen-data.py shards
+        "files": {split: [file_sha256(p) for p in sorted(glob.glob(path))]
+                  for split, path in sorted(data_files.items())},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def load_tokenized(data_files, tokenizer, mode, max_length, cache_dir):
+    """
+    Tokenized DatasetDict, memory-mapped from cache_dir when a trial with the
+    same tokenizer, files and mode already built it. The first trial to miss
+    takes a file lock and builds; the others wait and then open its copy.
+    """
+    if not cache_dir:
+        ds = load_dataset("json", data_files=data_files)
+        return prepare_dataset(ds, tokenizer, mode, max_length)
+
+    t0 = time.perf_counter()
+    key = dataset_cache_key(tokenizer, data_files, mode, max_length)
+    path = os.path.join(cache_dir, f"{mode}-{max_length}-{key[:16]}")
+    if not os.path.isdir(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with FileLock(path + ".lock"):
+            if not os.path.isdir(path):    # nobody built it while we waited
+                ds = load_dataset("json", data_files=data_files)
+                ds = prepare_dataset(ds, tokenizer, mode, max_length)
+                tmp = f"{path}.tmp-{os.getpid()}"
+                ds.save_to_disk(tmp)
+                os.rename(tmp, path)
+                logging.info("tokenized dataset built in %.1fs, cached at %s",
+                             time.perf_counter() - t0, path)
+    ds = load_from_disk(path)
+    logging.info("tokenized dataset opened from %s in %.1fs", path, time.perf_counter() - t0)
+    return ds
+
+class TokenCountingTrainer(Trainer):
+    """Trainer that counts real vs. total (real + pad) tokens it trains on."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.real_tokens = 0
+        self.total_tokens = 0
+
+    def training_step(self, model, inputs, *args, **kwargs):
+        mask = inputs.get("attention_mask")
+        if mask is not None:
+            self.real_tokens += int(mask.sum())
+            self.total_tokens += mask.numel()
+        return super().training_step(model, inputs, *args, **kwargs)
+
 def parse_args():
     p = argparse.ArgumentParser()
     # model & data
     p.add_argument("--model_name_or_path", type=str, default="distilgpt2")
     p.add_argument("--train_file", type=str, default="/data/train.jsonl")
     p.add_argument("--validation_file", type=str, default="/data/valid.jsonl")
+    p.add_argument("--max_length", type=int, default=128)
+    # max_length: pad every line to --max_length (most of each step is pad tokens)
+    # dynamic:    length-grouped batches, padded only to their longest line
+    # packed:     lines concatenated (EOS-separated) into full --max_length blocks
+    p.add_argument("--data_mode", type=str, default="max_length",
+                   choices=["max_length", "dynamic", "packed"])
+    # tokenized Arrow datasets shared by all trials (e.g. on the PVC), "" = off
+    p.add_argument("--dataset_cache_dir", type=str, default="")
+    # CPU-only nodes: threads from the cgroup quota, bf16 autocast when the
+    # CPU has native bf16, dataloader workers; optionally torch.compile
+    p.add_argument("--cpu_perf", action="store_true")
+    p.add_argument("--torch_compile", action="store_true")
     # hyperparams
     p.add_argument("--per_device_train_batch_size", type=int, default=1)
     p.add_argument("--learning_rate", type=float, default=1e-4)
@@ -31,6 +211,8 @@ def parse_args():
 
 def main():
     args = parse_args()
+    # before any torch op: the interop pool can only be sized once
+    perf_kwargs = cpu_perf_profile(args)
 
     # 1) Load model & tokenizer
     model = AutoModelForCausalLM.from_pretrained(
@@ -62,15 +244,17 @@ def main():
 
     # 3) Prepare dataset
     data_files = {"train": args.train_file, "validation": args.validation_file}
-    ds = load_dataset("json", data_files=data_files)
-    def tokenize(batch):
-        return tokenizer(
-            batch["text"],
-            truncation=True,
-            padding="max_length",
-            max_length=128
+    ds = load_tokenized(data_files, tokenizer, args.data_mode, args.max_length,
+                        args.dataset_cache_dir)
+    if args.data_mode == "packed":
+        # blocks are full and already carry labels
+        collator = default_data_collator
+    else:
+        # labels = input_ids with pad positions masked out of the loss
+        collator = DataCollatorForLanguageModeling(
+            tokenizer, mlm=False,
+            pad_to_multiple_of=8 if args.data_mode == "dynamic" else None
         )
-    ds = ds.map(tokenize, batched=True, remove_columns=["text"])
 
     # 4) TrainingArguments & Trainer
     training_args = TrainingArguments(
@@ -83,23 +267,36 @@ def main():
         save_strategy="no",
         logging_steps=1,
         report_to=[],
+        # dynamic: batches of similar-length lines, so little padding is needed
+        group_by_length=args.data_mode == "dynamic",
+        length_column_name="length",
+        **perf_kwargs,
     )
     def compute_metrics(eval_pred):
         # HuggingFace returns loss in eval_pred.metrics["eval_loss"]
         return {}
 
-    trainer = Trainer(
+    trainer = TokenCountingTrainer(
         model=model,
         args=training_args,
         train_dataset=ds["train"],
         eval_dataset=ds["validation"],
+        data_collator=collator,
         compute_metrics=compute_metrics,
     )
 
     # 5) Train & Evaluate
-    trainer.train()
+    train_result = trainer.train()
     metrics = trainer.evaluate()
 
+    runtime = train_result.metrics.get("train_runtime", 0.0)
+    if trainer.total_tokens:
+        print(f"data_mode: {args.data_mode}")
+        print(f"train_tokens_per_sec: {trainer.real_tokens / runtime if runtime else 0.0:.1f}")
+        print(f"padding_fraction: {1 - trainer.real_tokens / trainer.total_tokens:.4f}")
+        print(f"train_seconds: {runtime:.1f}")
+    print(f"train_steps_per_sec: {train_result.metrics.get('train_steps_per_second', 0.0)}")
+
     # 6) Print out eval_loss for Katib
     eval_loss = metrics.get("eval_loss", None)
     print(f"eval_loss: {eval_loss}")
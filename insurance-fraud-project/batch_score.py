@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+batch_score.py
+
+Offline bulk scoring of a claims CSV with the memory-mapped bundle written by
+`train.py --bundle_output`. The CSV is streamed in fixed-size chunks from
+local disk or MinIO/S3 (s3://bucket/key), each chunk is encoded and scored in
+a worker process, and its predictions land in their own Parquet file:
+
+    <output>/_job.json              input, chunk size, bundle fingerprint
+    <output>/part-00000.parquet     row, [--keep_columns], fraud_prediction, fraud_probability
+    <output>/part-00001.parquet
+    ...
+    <output>/_SUCCESS.json          totals and rows/sec, written last
+
+Memory stays bounded: at most --max_inflight chunks are parsed but not yet
+written, and workers share the bundle's read-only mmaps via the page cache.
+
+Parts are written to a temp name and renamed, so an existing part is always
+complete. After a restart the job re-reads the CSV, skips the chunks whose
+part already exists, and scores the rest; _job.json refuses a resume with a
+different input, chunk size or bundle.
+
+Usage:
+    python3 batch_score.py \
+        --input s3://mlpipeline/insurance/claims.csv \
+        --bundle /mnt/data/fraud_bundle \
+        --output /mnt/scores/claims \
+        --chunk_rows 50000 --workers auto
+
+Runs from a checkout as is: <repo>/common (cpu_quota) is put on sys.path
+below; the image copies it next to this script.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+from bundle import load_bundle  # noqa: E402
+from fingerprint import fingerprint  # noqa: E402
+from cpu_quota import cpu_quota  # noqa: E402
+
+JOB_FILE = "_job.json"
+SUCCESS_FILE = "_SUCCESS.json"
+
+
+def part_path(output: str, index: int) -> str:
+    return os.path.join(output, f"part-{index:05d}.parquet")
+
+
+def open_input(path: str, endpoint: str):
+    """Local path as-is, or a streaming response body for s3://bucket/key."""
+    if not path.startswith("s3://"):
+        return path
+    from minio import Minio
+
+    bucket, _, key = path[len("s3://"):].partition("/")
+    client = Minio(
+        endpoint,
+        access_key=os.environ["AWS_ACCESS_KEY_ID"],
+        secret_key=os.environ["AWS_SECRET_ACCESS_KEY"],
+        secure=endpoint.endswith(":443")
+    )
+    return client.get_object(bucket, key)
+
+
+def column_dtypes(compiled) -> dict:
+    """
+    Pin the parser's dtypes to what the bundle expects. Left to inference,
+    a chunk whose categorical column happens to hold only digits would come
+    back as int and miss every string category of the one-hot tables.
+    """
+    dtypes = {c: "float64" for b in compiled.numeric_blocks for c in b.columns}
+    for b in compiled.onehot_blocks:
+        for c, cats in zip(b.columns, b.categories):
+            if all(isinstance(v, str) for v in cats):
+                dtypes[c] = "str"
+    return dtypes
+
+
+def check_job(output: str, job: dict, overwrite: bool) -> set:
+    """Indices of chunks already written by a previous run of the same job."""
+    os.makedirs(output, exist_ok=True)
+    path = os.path.join(output, JOB_FILE)
+    if os.path.exists(path) and not overwrite:
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != job:
+            raise SystemExit(f"{output} holds a different job ({previous}); use --overwrite")
+    else:
+        for name in os.listdir(output):
+            if name.startswith("part-") or name == SUCCESS_FILE:
+                os.remove(os.path.join(output, name))
+        with open(path, "w") as f:
+            json.dump(job, f, indent=2)
+    return {int(name[5:10]) for name in os.listdir(output)
+            if name.startswith("part-") and name.endswith(".parquet")}
+
+
+# ---- worker side: the bundle is opened once per process -------------------
+_bundle = None
+
+
+def _init_worker(bundle_dir: str):
+    global _bundle
+    _bundle = load_bundle(bundle_dir)
+
+
+def score_chunk(index: int, start_row: int, chunk: pd.DataFrame, keep_columns, output: str):
+    t0 = time.perf_counter()
+    X = _bundle.preprocessor.encode_columns(chunk.to_dict("list"))
+    forest = _bundle.forest
+    proba = forest.predict_proba(X)
+    positive = int(np.flatnonzero(forest.classes == 1)[0]) if 1 in forest.classes else proba.shape[1] - 1
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {"row": pa.array(np.arange(start_row, start_row + len(chunk), dtype=np.int64))}
+    for c in keep_columns:
+        columns[c] = pa.array(chunk[c].to_numpy(), from_pandas=True)
+    columns["fraud_prediction"] = pa.array(forest.classes.take(np.argmax(proba, axis=1)))
+    columns["fraud_probability"] = pa.array(proba[:, positive])
+    path = part_path(output, index)
+    pq.write_table(pa.table(columns), path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return index, len(chunk), time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked bulk scoring of a claims CSV to Parquet")
+    parser.add_argument('--input',        type=str, required=True,
+                        help="Local CSV path or s3://bucket/key")
+    parser.add_argument('--bundle',       type=str, required=True,
+                        help="Directory written by train.py --bundle_output")
+    parser.add_argument('--output',       type=str, required=True,
+                        help="Directory for the Parquet parts (keep it on a PVC to resume)")
+    parser.add_argument('--chunk_rows',   type=int, default=50000,
+                        help="Rows per chunk / Parquet part")
+    parser.add_argument('--workers',      type=str, default="auto",
+                        help="Scoring processes: 'auto' (container CPU quota) or a number")
+    parser.add_argument('--max_inflight', type=int, default=0,
+                        help="Chunks parsed but not yet written (0 means 2 x workers)")
+    parser.add_argument('--keep_columns', type=str, default="",
+                        help="Comma-separated input columns copied next to the predictions")
+    parser.add_argument('--s3_endpoint',  type=str,
+                        default=os.getenv("S3_ENDPOINT", "minio-service.kubeflow:9000"))
+    parser.add_argument('--overwrite',    action='store_true',
+                        help="Discard parts from a previous, different job")
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle)
+    compiled = bundle.preprocessor
+    keep_columns = [c for c in args.keep_columns.split(",") if c]
+    n_workers = cpu_quota() if args.workers == "auto" else max(1, int(args.workers))
+    max_inflight = args.max_inflight or 2 * n_workers
+
+    job = {"input": args.input, "chunk_rows": args.chunk_rows,
+           "bundle": fingerprint(args.bundle), "keep_columns": keep_columns}
+    done = check_job(args.output, job, args.overwrite)
+    if os.path.exists(os.path.join(args.output, SUCCESS_FILE)):
+        print(f"{args.output} is already complete")
+        return
+    if done:
+        print(f"resuming: {len(done)} chunks already written")
+
+    dtypes = column_dtypes(compiled)
+    wanted = set(compiled.columns) | set(keep_columns)
+    reader = pd.read_csv(open_input(args.input, args.s3_endpoint), chunksize=args.chunk_rows,
+                         dtype=dtypes, usecols=lambda c: c in wanted)
+
+    # fork: workers start from the parent's already-imported modules
+    pool = ProcessPoolExecutor(n_workers, mp_context=get_context("fork"),
+                               initializer=_init_worker, initargs=(args.bundle,))
+    t0 = time.perf_counter()
+    rows = chunks = 0
+    pending = set()
+
+    def collect(block):
+        nonlocal rows, chunks, pending
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+        for fut in finished:
+            index, n, seconds = fut.result()
+            rows += n
+            chunks += 1
+            elapsed = time.perf_counter() - t0
+            print(f"chunk {index}: {n} rows in {seconds:.2f}s, "
+                  f"{rows} rows total, {rows / elapsed:,.0f} rows/s")
+
+    try:
+        start_row = 0
+        for index, chunk in enumerate(reader):
+            if index not in done:
+                pending.add(pool.submit(score_chunk, index, start_row, chunk, keep_columns, args.output))
+                if len(pending) >= max_inflight:
+                    collect(block=True)
+            start_row += len(chunk)
+        if pending:
+            collect(block=False)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - t0
+    summary = {"input_rows": start_row, "scored_rows": rows, "scored_chunks": chunks,
+               "resumed_chunks": len(done), "workers": n_workers, "seconds": round(elapsed, 3),
+               "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0.0}
+    with open(os.path.join(args.output, SUCCESS_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"rows_per_sec={summary['rows_per_sec']}")
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# batching.py
+"""
+Adaptive micro-batching for the fraud model server.
+
+Concurrent requests are queued and merged into one feature matrix, scored with
+a single `predict` call in a worker thread, and each caller gets back only its
+own rows. A batch is closed when it reaches `max_batch_size` rows or when
+`max_wait_ms` has passed since its first request.
+
+The wait is adaptive: when the previous batch held a single request (no
+concurrency) the batcher dispatches immediately, so an idle server adds no
+latency. Under load, requests accumulate while earlier batches are being
+scored and batches grow on their own. Up to `max_inflight` batches are scored
+at once (one per worker process when the server runs a worker pool).
+"""
+import asyncio
+import bisect
+import time
+
+import numpy as np
+
+
+class Histogram:
+    """Fixed-bucket counter (cumulative `le` buckets, Prometheus style)."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def snapshot(self):
+        cumulative, running = {}, 0
+        for le, c in zip(self.buckets + ["+Inf"], self.counts):
+            running += c
+            cumulative[str(le)] = running
+        return {"buckets": cumulative, "count": self.total, "sum": self.sum}
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=2.0, max_inflight=1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_inflight = max_inflight
+        self.queue = None
+        self._task = None
+        self._loop = None
+        self._slots = None
+        self._inflight = set()
+        self._last_batch_requests = 0
+        self.batch_rows = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024])
+        self.batch_requests = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def submit(self, X):
+        """Queue a feature matrix and wait for its predictions (a list)."""
+        if X.shape[0] == 0:
+            return []
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            self.start()   # lazily, on the loop that serves requests
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self):
+        first = await self.queue.get()
+        batch, rows = [first], first[0].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        adaptive_wait = self._last_batch_requests > 1
+        while rows < self.max_batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - time.perf_counter()
+                if not adaptive_wait or timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            rows += item[0].shape[0]
+        return batch, rows
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            batch, rows = await self._collect()
+            now = time.perf_counter()
+            for _, _, t_enq in batch:
+                self.queue_wait_ms.observe((now - t_enq) * 1000.0)
+            self.batch_rows.observe(rows)
+            self.batch_requests.observe(len(batch))
+            self._last_batch_requests = len(batch)
+
+            task = self._loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            X = batch[0][0] if len(batch) == 1 else np.vstack([x for x, _, _ in batch])
+            try:
+                preds = await self._loop.run_in_executor(None, self.predict_fn, X)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+
+            start = 0
+            for x, fut, _ in batch:
+                stop = start + x.shape[0]
+                if not fut.done():   # caller may have gone away
+                    fut.set_result(preds[start:stop])
+                start = stop
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "inflight": len(self._inflight),
+            "batch_rows": self.batch_rows.snapshot(),
+            "batch_requests": self.batch_requests.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
@@ -0,0 +1,97 @@
+# bundle.py
+"""
+Memory-mapped model bundle for the fraud server (pickle-free alternative to
+`fraud_pipeline_final.joblib`).
+
+Layout, written by `train.py --bundle_output <dir>`:
+
+    <dir>/manifest.json           format/version, shapes, categories, file names,
+                                  sha256 fingerprint of the array files
+    <dir>/preprocessor/*.npy      numeric imputer/scaler vectors (fastpath.py)
+    <dir>/forest/*.npy            flat tree arrays (forest.py)
+
+`load_bundle` only parses the manifest; the preprocessor tables and forest
+arrays are opened on first access with `np.load(mmap_mode='r')`, so nothing
+is unpickled or copied into private heap memory. Pages are faulted in from
+the page cache on demand and shared by every process on the node that maps
+the same files.
+"""
+import json
+import os
+import time
+
+from fingerprint import fingerprint
+from fastpath import CompiledPreprocessor
+from forest import PackedForest
+
+FORMAT = "insurance-fraud-bundle"
+VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def write_bundle(directory: str, compiled: CompiledPreprocessor, packed: PackedForest) -> None:
+    os.makedirs(directory, exist_ok=True)
+    pre_meta = compiled.save(os.path.join(directory, "preprocessor"))
+    packed.save(os.path.join(directory, "forest"))
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "created_at": int(time.time()),
+        "n_features": compiled.n_features,
+        "preprocessor": pre_meta,
+        "forest": {"path": "forest", "n_trees": packed.n_trees, "n_nodes": packed.n_nodes},
+        # hashed once here, so loading never has to read every array to name the model
+        "fingerprint": fingerprint(directory, exclude={MANIFEST, MANIFEST + ".tmp"}),
+    }
+    # write the manifest last: its presence marks the bundle as complete
+    tmp = os.path.join(directory, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+
+def is_bundle(directory: str) -> bool:
+    return bool(directory) and os.path.isfile(os.path.join(directory, MANIFEST))
+
+
+class Bundle:
+    def __init__(self, directory: str, manifest: dict):
+        self.directory = directory
+        self.manifest = manifest
+        self._preprocessor = None
+        self._forest = None
+        self.load_seconds = {}
+
+    @property
+    def preprocessor(self) -> CompiledPreprocessor:
+        if self._preprocessor is None:
+            t0 = time.perf_counter()
+            self._preprocessor = CompiledPreprocessor.load(
+                self.manifest["preprocessor"], os.path.join(self.directory, "preprocessor"))
+            self.load_seconds["preprocessor"] = time.perf_counter() - t0
+        return self._preprocessor
+
+    @property
+    def forest(self) -> PackedForest:
+        if self._forest is None:
+            t0 = time.perf_counter()
+            self._forest = PackedForest.load(
+                os.path.join(self.directory, self.manifest["forest"]["path"]))
+            self.load_seconds["forest"] = time.perf_counter() - t0
+        return self._forest
+
+    @property
+    def fingerprint(self) -> str:
+        # bundles exported before the manifest carried one are hashed in full
+        return self.manifest.get("fingerprint") or fingerprint(self.directory)
+
+
+def load_bundle(directory: str) -> Bundle:
+    t0 = time.perf_counter()
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+        raise ValueError(f"unsupported bundle: {manifest.get('format')} v{manifest.get('version')}")
+    b = Bundle(directory, manifest)
+    b.load_seconds["manifest"] = time.perf_counter() - t0
+    return b
@@ -0,0 +1,127 @@
+# cache.py
+"""
+Content-addressed prediction cache for the fraud model server.
+
+Every row is keyed by a canonical hash of its features plus a fingerprint of
+the loaded model (for a bundle, the content hash train.py records in its
+manifest), so a new bundle never serves stale predictions:
+
+    fraud:pred:<model fingerprint[:16]>:<blake2b(canonical row)>
+
+Canonical form: keys sorted, numeric columns cast to float (48 and 48.0 are
+the same claim to the model), everything else kept as-is ("466132" and 466132
+are *not* the same to the one-hot encoder).
+
+The in-process tier is a bounded LRU. An optional Redis tier (REDIS_URL)
+shares the same keys across replicas; Redis errors are counted and otherwise
+ignored, the server just scores the rows itself.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, model_fingerprint, numeric_columns=(), max_entries=100_000,
+                 redis_url="", ttl_seconds=86400):
+        self.prefix = f"fraud:pred:{model_fingerprint[:16]}:"
+        self.numeric_columns = frozenset(numeric_columns)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.redis_hits = self.redis_errors = 0
+        self.redis = None
+        if redis_url:
+            import redis
+            self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    def _norm(self, column, v):
+        if column in self.numeric_columns and isinstance(v, (int, float)) and not isinstance(v, bool):
+            return float(v)
+        return v
+
+    def _hash(self, blob: str) -> str:
+        return self.prefix + hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+    def key(self, row: dict) -> str:
+        norm = {c: self._norm(c, v) for c, v in row.items()}
+        return self._hash(json.dumps(norm, sort_keys=True, separators=(",", ":")))
+
+    def keys_columns(self, columns: dict) -> list:
+        """key() of every row of a column-oriented batch, without building row dicts first."""
+        names = sorted(columns)
+        cols = [[self._norm(c, v) for v in columns[c]] for c in names]
+        # the names are already sorted, so this is the same JSON key() hashes
+        return [self._hash(json.dumps(dict(zip(names, values)), separators=(",", ":")))
+                for values in zip(*cols)]
+
+    def get_many(self, keys):
+        """Cached prediction per key, None for misses."""
+        found = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, k in enumerate(keys):
+                v = self._lru.get(k)
+                if v is None:
+                    missing.append(i)
+                else:
+                    self._lru.move_to_end(k)
+                    found[i] = v
+        if missing and self.redis is not None:
+            try:
+                remote = self.redis.mget([keys[i] for i in missing])
+            except Exception:
+                self.redis_errors += 1
+                remote = [None] * len(missing)
+            promoted = {}
+            still_missing = []
+            for i, v in zip(missing, remote):
+                if v is None:
+                    still_missing.append(i)
+                else:
+                    found[i] = promoted[keys[i]] = json.loads(v)
+            self.redis_hits += len(promoted)
+            self._store(promoted)
+            missing = still_missing
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return found
+
+    def put_many(self, keys, values):
+        items = dict(zip(keys, values))
+        self._store(items)
+        if self.redis is not None and items:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for k, v in items.items():
+                    pipe.set(k, json.dumps(v), ex=self.ttl_seconds if self.ttl_seconds > 0 else None)
+                pipe.execute()
+            except Exception:
+                self.redis_errors += 1
+
+    def _store(self, items):
+        with self._lock:
+            for k, v in items.items():
+                self._lru[k] = v
+                self._lru.move_to_end(k)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "redis": self.redis is not None,
+            "redis_hits": self.redis_hits,
+            "redis_errors": self.redis_errors,
+        }
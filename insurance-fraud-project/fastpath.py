@@ -0,0 +1,245 @@
+# fastpath.py
+"""
+Compiled inference path for the insurance-fraud preprocessor.
+
+At startup the fitted ColumnTransformer from the joblib bundle is turned into
+plain lookup tables:
+
+  * numeric blocks  -> imputer fill vector + scaler mean/scale vectors
+  * one-hot blocks  -> one {category: column_index} dict per input column
+
+A batch is then encoded straight into a preallocated NumPy matrix, without
+building a pandas DataFrame or walking the sklearn transformers. The float
+operations are the same ones sklearn performs (fill, subtract mean, divide by
+scale), so the encoded matrix -- and therefore the predictions -- match
+`pre.transform(df)` exactly.
+
+Only the layout produced by the training notebook is supported
+(SimpleImputer -> StandardScaler and SimpleImputer -> OneHotEncoder pipelines).
+`compile_preprocessor` raises ValueError for anything else so the caller can
+fall back to the generic pandas path.
+
+The tables can also be written to / read from a directory (`save` / `load`):
+numeric vectors as `.npy` files, categories inline in the returned manifest
+dict. Loading needs neither sklearn nor pickle.
+"""
+import math
+import os
+
+import numpy as np
+
+
+def _is_missing(value) -> bool:
+    # SimpleImputer(missing_values=np.nan) sees NaN; pandas turns a JSON null
+    # (None) into NaN when it builds the DataFrame, and so does a row without
+    # the key
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class _NumericBlock:
+    VECTORS = ("fill", "mean", "scale")
+
+    def __init__(self, columns, out, fill, mean, scale):
+        self.columns = list(columns)
+        self.out = out            # slice into the output matrix
+        self.fill = fill          # imputer statistics (or None)
+        self.mean = mean          # scaler mean_ (or None)
+        self.scale = scale        # scaler scale_ (or None)
+
+    def write(self, X, values):
+        # values: float64 array of shape (n_rows, n_columns), NaN for missing
+        if self.fill is not None:
+            nan_rows, nan_cols = np.nonzero(np.isnan(values))
+            values[nan_rows, nan_cols] = self.fill[nan_cols]
+        if self.mean is not None:
+            values -= self.mean
+        if self.scale is not None:
+            values /= self.scale
+        X[:, self.out] = values
+
+
+class _OneHotBlock:
+    def __init__(self, columns, out, fill, categories):
+        self.columns = list(columns)
+        self.out = out
+        self.fill = fill
+        self.categories = [list(cats) for cats in categories]
+        self.tables = []
+        self.offsets = []
+        offset = out.start
+        for cats in self.categories:
+            self.tables.append({c: i for i, c in enumerate(cats)})
+            self.offsets.append(offset)
+            offset += len(cats)
+
+    def write_column(self, X, j, values):
+        # handle_unknown='ignore': unseen categories leave the block all-zero
+        table, offset, fill = self.tables[j], self.offsets[j], self.fill
+        rows, cols = [], []
+        for i, v in enumerate(values):
+            if fill is not None and _is_missing(v):
+                v = fill
+            idx = table.get(v)
+            if idx is not None:
+                rows.append(i)
+                cols.append(offset + idx)
+        X[rows, cols] = 1.0
+
+
+def _unpack_pipeline(trans):
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+
+    steps = [s for _, s in trans.steps] if isinstance(trans, Pipeline) else [trans]
+    imputer = None
+    if steps and isinstance(steps[0], SimpleImputer):
+        imputer = steps.pop(0)
+        if imputer.add_indicator or imputer.missing_values is None \
+                or not _is_missing(imputer.missing_values):
+            raise ValueError("unsupported SimpleImputer configuration")
+    if len(steps) != 1:
+        raise ValueError(f"unsupported pipeline: {trans!r}")
+    return imputer, steps[0]
+
+
+class CompiledPreprocessor:
+    """Table-driven replacement for a fitted ColumnTransformer."""
+
+    def __init__(self, numeric_blocks, onehot_blocks, n_features):
+        self.numeric_blocks = numeric_blocks
+        self.onehot_blocks = onehot_blocks
+        self.n_features = n_features
+        self.columns = [c for b in numeric_blocks + onehot_blocks for c in b.columns]
+
+    @classmethod
+    def from_column_transformer(cls, pre):
+        from sklearn.compose import ColumnTransformer
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        if not isinstance(pre, ColumnTransformer):
+            raise ValueError(f"expected a ColumnTransformer, got {type(pre).__name__}")
+        numeric_blocks, onehot_blocks = [], []
+        for name, trans, columns in pre.transformers_:
+            out = pre.output_indices_[name]
+            if trans == "drop" or out.stop == out.start:
+                continue
+            if trans == "passthrough":
+                raise ValueError("passthrough columns are not supported")
+            imputer, last = _unpack_pipeline(trans)
+            if isinstance(last, StandardScaler):
+                if imputer is not None and imputer.strategy == "constant":
+                    raise ValueError("constant imputation of numeric columns is not supported")
+                fill = None if imputer is None else np.asarray(imputer.statistics_, dtype=np.float64)
+                numeric_blocks.append(_NumericBlock(columns, out, fill, last.mean_, last.scale_))
+            elif isinstance(last, OneHotEncoder):
+                if last.handle_unknown != "ignore" or last.drop_idx_ is not None \
+                        or getattr(last, "_infrequent_enabled", False):
+                    raise ValueError("only OneHotEncoder(handle_unknown='ignore') without drop/infrequent is supported")
+                fill = None
+                if imputer is not None:
+                    if imputer.strategy != "constant":
+                        raise ValueError("only constant imputation of categorical columns is supported")
+                    fill = imputer.fill_value
+                categories = [cats.tolist() for cats in last.categories_]
+                onehot_blocks.append(_OneHotBlock(columns, out, fill, categories))
+            else:
+                raise ValueError(f"unsupported transformer: {last!r}")
+        n_features = max(s.stop for s in pre.output_indices_.values())
+        return cls(numeric_blocks, onehot_blocks, n_features)
+
+    def _check_columns(self, present):
+        # same error as ColumnTransformer.transform on a DataFrame without them
+        absent = set(self.columns) - set(present)
+        if absent:
+            raise ValueError(f"columns are missing: {absent}")
+
+    def encode_rows(self, rows) -> np.ndarray:
+        """Encode row-oriented input: a list of {column: value} dicts."""
+        if rows:
+            self._check_columns({c for r in rows for c in r})
+        nan = float("nan")
+        X = np.zeros((len(rows), self.n_features), dtype=np.float64)
+        for block in self.numeric_blocks:
+            cols = block.columns
+            values = np.array([[r.get(c, nan) for c in cols] for r in rows], dtype=np.float64)
+            block.write(X, values.reshape(len(rows), len(cols)))
+        for block in self.onehot_blocks:
+            for j, c in enumerate(block.columns):
+                block.write_column(X, j, [r.get(c, nan) for r in rows])
+        return X
+
+    def encode_columns(self, columns) -> np.ndarray:
+        """Encode column-oriented input: {column: [value, ...]}."""
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("all columns must have the same length")
+        n = lengths.pop() if lengths else 0
+        self._check_columns(columns)
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        for block in self.numeric_blocks:
+            values = np.empty((n, len(block.columns)), dtype=np.float64)
+            for j, c in enumerate(block.columns):
+                values[:, j] = np.asarray(columns[c], dtype=np.float64)
+            block.write(X, values)
+        for block in self.onehot_blocks:
+            for j, c in enumerate(block.columns):
+                block.write_column(X, j, columns[c])
+        return X
+
+    def save(self, directory: str) -> dict:
+        """Write the numeric vectors as .npy files; return the manifest entry."""
+        os.makedirs(directory, exist_ok=True)
+        numeric = []
+        for i, block in enumerate(self.numeric_blocks):
+            entry = {"columns": block.columns, "out": [block.out.start, block.out.stop]}
+            for name in _NumericBlock.VECTORS:
+                vec = getattr(block, name)
+                entry[name] = None
+                if vec is not None:
+                    entry[name] = f"numeric_{i}_{name}.npy"
+                    np.save(os.path.join(directory, entry[name]), np.asarray(vec, dtype=np.float64))
+            numeric.append(entry)
+        onehot = [{"columns": b.columns, "out": [b.out.start, b.out.stop],
+                   "fill": b.fill, "categories": b.categories}
+                  for b in self.onehot_blocks]
+        return {"n_features": self.n_features, "numeric": numeric, "onehot": onehot}
+
+    @classmethod
+    def load(cls, meta: dict, directory: str, mmap_mode: str = "r"):
+        numeric_blocks = []
+        for entry in meta["numeric"]:
+            vectors = {name: None if entry[name] is None
+                       else np.load(os.path.join(directory, entry[name]), mmap_mode=mmap_mode)
+                       for name in _NumericBlock.VECTORS}
+            numeric_blocks.append(_NumericBlock(entry["columns"], slice(*entry["out"]), **vectors))
+        onehot_blocks = [_OneHotBlock(e["columns"], slice(*e["out"]), e["fill"], e["categories"])
+                         for e in meta["onehot"]]
+        return cls(numeric_blocks, onehot_blocks, meta["n_features"])
+
+
+def compile_preprocessor(pre) -> CompiledPreprocessor:
+    return CompiledPreprocessor.from_column_transformer(pre)
+
+
+def check_parity(compiled: CompiledPreprocessor, pre, X, n_rows: int = 64) -> int:
+    """
+    Number of rows where the compiled path disagrees with `pre.transform` on
+    the first `n_rows` of X, both as-is and with one value per column replaced
+    by a JSON null, encoded from rows and from columns.
+    """
+    import pandas as pd
+
+    sample = X.head(n_rows).to_dict("records")
+    batches = [sample]
+    for j, c in enumerate(compiled.columns):
+        rows = [dict(r) for r in sample]
+        rows[j % len(rows)][c] = None
+        batches.append(rows)
+    mismatches = 0
+    for rows in batches:
+        expected = pre.transform(pd.DataFrame(rows))
+        expected = expected.toarray() if hasattr(expected, "toarray") else np.asarray(expected)
+        cols = {c: [r[c] for r in rows] for c in rows[0]}
+        for got in (compiled.encode_rows(rows), compiled.encode_columns(cols)):
+            mismatches += int(np.sum(np.any(got != expected, axis=1)))
+    return mismatches
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# features.py
+"""
+Pre-transformed feature matrix cache for the fraud trainer.
+
+Every Katib trial used to re-read the cleaned CSV and re-run `pre.transform`,
+identical work each time. This transforms once and stores the result,
+content-addressed by the CSV and the preprocessor:
+
+    <features_dir>/<key[:16]>/features.json   key, format, shape, dtype (written last)
+    <features_dir>/<key[:16]>/X.npy           dense matrix, or for CSR output:
+    <features_dir>/<key[:16]>/X_data.npy, X_indices.npy, X_indptr.npy
+    <features_dir>/<key[:16]>/y.npy           int64 labels
+
+key = sha256(format version, sha256(clean CSV), sha256(preprocessor.joblib)),
+so a new CSV or a refitted preprocessor never reads a stale matrix. The
+arrays are plain .npy, opened with `np.load(mmap_mode='r')`, so a trial only
+pays for reading pages rather than for parsing and encoding.
+
+Concurrent trials may build the same entry: each writes into a private temp
+directory (mkdtemp, unique across the pods sharing the volume, where PIDs are
+not) and renames it into place; the loser discards its copy.
+
+Run once ahead of a sweep (or let the first trial do it):
+    python3 features.py \
+        --clean_csv=/mnt/data/insurance_fraud_cleaned.csv \
+        --prep_joblib=/mnt/data/preprocessor.joblib \
+        --features_dir=/mnt/data/features
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from fingerprint import fingerprint
+
+FORMAT = "insurance-fraud-features"
+VERSION = 1
+MANIFEST = "features.json"
+LABEL = "fraud_reported"
+
+
+def features_key(clean_csv: str, prep_joblib: str) -> str:
+    h = hashlib.sha256(f"{FORMAT}/{VERSION}".encode())
+    h.update(fingerprint(clean_csv).encode())
+    h.update(fingerprint(prep_joblib).encode())
+    return h.hexdigest()
+
+
+def load_frame(clean_csv: str):
+    import pandas as pd
+
+    df = pd.read_csv(clean_csv)
+    return df.drop(LABEL, axis=1), df[LABEL].map({'Y': 1, 'N': 0})
+
+
+def write_features(directory: str, key: str, X, y) -> None:
+    """Write one entry; the manifest goes last and marks it complete."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"format": FORMAT, "version": VERSION, "key": key,
+                "created_at": int(time.time()), "shape": list(X.shape), "dtype": str(X.dtype)}
+    if hasattr(X, "tocsr"):
+        X = X.tocsr()
+        manifest["layout"] = "csr"
+        for part in ("data", "indices", "indptr"):
+            np.save(os.path.join(directory, f"X_{part}.npy"), getattr(X, part))
+    else:
+        manifest["layout"] = "dense"
+        np.save(os.path.join(directory, "X.npy"), np.ascontiguousarray(X))
+    np.save(os.path.join(directory, "y.npy"), np.asarray(y, dtype=np.int64))
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+
+def read_features(directory: str, key: str, mmap_mode: str = "r"):
+    """(X, y) from an entry, or None if it is missing, incomplete or stale."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != FORMAT or manifest.get("version") != VERSION \
+            or manifest.get("key") != key:
+        return None
+
+    def load(name):
+        return np.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+
+    if manifest["layout"] == "csr":
+        from scipy.sparse import csr_matrix
+
+        X = csr_matrix((load("X_data.npy"), load("X_indices.npy"), load("X_indptr.npy")),
+                       shape=tuple(manifest["shape"]), copy=False)
+    else:
+        X = load("X.npy")
+    return X, load("y.npy")
+
+
+def load_or_build(features_dir: str, clean_csv: str, prep_joblib: str, pre=None):
+    """
+    (X_fe, y, hit) for this CSV and preprocessor. On a miss the matrix is
+    built with `pre.transform` (loading the preprocessor if not given) and
+    stored for the next caller.
+    """
+    key = features_key(clean_csv, prep_joblib)
+    entry = os.path.join(features_dir, key[:16])
+    cached = read_features(entry, key)
+    if cached is not None:
+        return cached[0], cached[1], True
+
+    if pre is None:
+        import joblib
+        pre = joblib.load(prep_joblib)
+    X, y = load_frame(clean_csv)
+    X_fe = pre.transform(X)
+
+    os.makedirs(features_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f"{key[:16]}.tmp-", dir=features_dir)
+    os.chmod(tmp, 0o755)  # mkdtemp's 0700 would hide the entry from other users
+    write_features(tmp, key, X_fe, y)
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # another trial got there first (or a stale entry is in the way)
+        if read_features(entry, key) is None:
+            shutil.rmtree(entry, ignore_errors=True)
+            os.rename(tmp, entry)
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return X_fe, np.asarray(y, dtype=np.int64), False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cached fraud feature matrix")
+    parser.add_argument('--clean_csv',    type=str, required=True,
+                        help="Path to cleaned CSV")
+    parser.add_argument('--prep_joblib',  type=str, required=True,
+                        help="Path to preprocessor.joblib")
+    parser.add_argument('--features_dir', type=str, required=True,
+                        help="Cache directory (shared by the trials, e.g. on a PVC)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    X_fe, y, hit = load_or_build(args.features_dir, args.clean_csv, args.prep_joblib)
+    print(f"{'reused' if hit else 'built'} {X_fe.shape[0]}x{X_fe.shape[1]} feature matrix "
+          f"in {time.perf_counter() - t0:.2f}s under {args.features_dir}")
+
+
+if __name__ == '__main__':
+    main()
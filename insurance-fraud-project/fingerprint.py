@@ -0,0 +1,30 @@
+# fingerprint.py
+"""
+Content hash of a model artifact (a file or a directory), shared by the
+trainer, the feature cache, the batch scorer and the server: bundle manifests,
+feature-cache keys, batch-job records and prediction-cache keys all identify
+an artifact by it.
+"""
+import hashlib
+import os
+
+
+def fingerprint(path: str, exclude=()) -> str:
+    """sha256 over a model file, or over every file of a directory but `exclude`."""
+    h = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                p = os.path.join(root, name)
+                if os.path.relpath(p, path) in exclude:
+                    continue
+                h.update(os.path.relpath(p, path).encode())
+                with open(p, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        h.update(block)
+    else:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,136 @@
+# forest.py
+"""
+Flat-array export of a fitted RandomForestClassifier.
+
+All trees are packed into contiguous arrays indexed by a global node id:
+
+    feature[n]    split feature          (int32, 0 for leaves)
+    threshold[n]  split threshold        (float64)
+    left[n]       left child node id     (int32, self for leaves)
+    right[n]      right child node id    (int32, self for leaves)
+    value[n, k]   class probabilities    (float64, normalised per node)
+    roots[t]      node id of tree t's root
+
+Leaves point at themselves, so a batch can be pushed through every tree one
+level at a time with NumPy fancy indexing: (row, tree) pairs that reach a leaf
+drop out of the active set, and after at most `max_depth` levels every pair
+sits on its leaf. Probabilities are averaged over trees and the argmax picks
+the class, exactly like `RandomForestClassifier.predict` (rows are cast to
+float32 first, as sklearn's tree code does).
+
+`save` writes one `.npy` file per array plus `forest.json`; `load` opens the
+arrays with `mmap_mode='r'` so replicas on one node share the page cache.
+"""
+import json
+import os
+
+import numpy as np
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+
+
+class PackedForest:
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, clf):
+        if getattr(clf, "n_outputs_", 1) != 1:
+            raise ValueError("only single-output forests can be packed")
+        trees = [est.tree_ for est in clf.estimators_]
+        n_classes = len(clf.classes_)
+        n_nodes = sum(t.node_count for t in trees)
+
+        feature = np.zeros(n_nodes, dtype=np.int32)
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        left = np.empty(n_nodes, dtype=np.int32)
+        right = np.empty(n_nodes, dtype=np.int32)
+        value = np.empty((n_nodes, n_classes), dtype=np.float64)
+        roots = np.empty(len(trees), dtype=np.int32)
+
+        offset = 0
+        for i, t in enumerate(trees):
+            n = t.node_count
+            ids = np.arange(offset, offset + n, dtype=np.int32)
+            leaf = t.children_left == -1
+            feature[offset:offset + n] = np.where(leaf, 0, t.feature)
+            threshold[offset:offset + n] = t.threshold
+            left[offset:offset + n] = np.where(leaf, ids, t.children_left + offset)
+            right[offset:offset + n] = np.where(leaf, ids, t.children_right + offset)
+            # same normalisation as DecisionTreeClassifier.predict_proba
+            v = t.value[:, 0, :n_classes].astype(np.float64)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0.0] = 1.0
+            value[offset:offset + n] = v / norm
+            roots[i] = offset
+            offset += n
+
+        max_depth = max(t.max_depth for t in trees)
+        return cls(feature, threshold, left, right, value, roots,
+                   np.asarray(clf.classes_), max_depth)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node id for every (row, tree) pair, shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        node = np.tile(self.roots, n_rows)                      # flat (row, tree)
+        row = np.repeat(np.arange(n_rows), self.n_trees)
+        active = np.arange(node.size)
+        for _ in range(self.max_depth):
+            cur = node[active]
+            go_left = X[row[active], self.feature[cur]] <= self.threshold[cur]
+            nxt = np.where(go_left, self.left[cur], self.right[cur])
+            node[active] = nxt
+            # pairs that reached a leaf (self-loop) drop out of the next level
+            active = active[nxt != cur]
+            if active.size == 0:
+                break
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for t in range(self.n_trees):          # tree order, like sklearn's sum
+            proba += self.value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        meta = {"n_trees": self.n_trees, "n_nodes": self.n_nodes, "max_depth": self.max_depth,
+                "n_classes": int(self.value.shape[1])}
+        with open(os.path.join(directory, "forest.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = "r"):
+        with open(os.path.join(directory, "forest.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ARRAYS}
+        return cls(max_depth=meta["max_depth"], **arrays)
+
+
+def check_parity(packed: PackedForest, clf, X) -> int:
+    """Number of rows where the packed forest disagrees with `clf.predict`."""
+    return int(np.sum(packed.predict(X) != clf.predict(X)))
@@ -1,8 +1,12 @@
 import os
+import sys
 import streamlit as st
-import requests
 import pandas as pd
 
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+import kserve_client  # noqa: E402  # pooled keep-alive session, retries on 503
+
 # UI Title
 st.title("Insurance Fraud Detection")
 
@@ -90,7 +94,7 @@ PREDICTOR_URL = os.getenv("PREDICTOR_URL", "http://localhost:8080/v1/models/insu
 if st.button("Predict Fraud"):
     instances = input_df.to_dict(orient='records')
     payload = {"instances": instances}
-    response = requests.post(
+    response = kserve_client.post(
         PREDICTOR_URL,
         json=payload
     )
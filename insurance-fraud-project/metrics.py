@@ -0,0 +1,66 @@
+# metrics.py
+"""
+Prometheus instrumentation for the fraud model server (GET /metrics).
+
+    fraud_stage_seconds{stage}       parse | cache | encode | predict | serialize
+    fraud_request_seconds            whole predict route, parse to serialized body
+    fraud_request_rows               rows per request
+    fraud_request_bytes              request body size
+    fraud_predict_batch_rows         rows per model call (after micro-batching)
+    fraud_requests_total{code}       responses by status code
+    fraud_model_load_seconds{format} one-off, bundle or joblib
+    process_*                        RSS, CPU, open fds (prometheus_client's ProcessCollector)
+
+Stage children are resolved once up front, so an observation on the hot path
+is one lock and a bucket bisect. server.py only builds `ServerMetrics` when
+METRICS_ENABLED is true; otherwise `timer()` is a shared no-op context manager
+and prometheus_client is never imported.
+"""
+from contextlib import nullcontext
+
+STAGES = ("parse", "cache", "encode", "predict", "serialize")
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_NOOP = nullcontext()
+
+
+class ServerMetrics:
+    def __init__(self):
+        from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, ProcessCollector
+
+        self.registry = CollectorRegistry()
+        ProcessCollector(registry=self.registry)
+        stage = Histogram("fraud_stage_seconds", "Time per predict stage", ["stage"],
+                          buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.stages = {s: stage.labels(s) for s in STAGES}
+        self.request_seconds = Histogram("fraud_request_seconds", "Predict route latency",
+                                         buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.request_rows = Histogram("fraud_request_rows", "Rows per predict request",
+                                      buckets=ROW_BUCKETS, registry=self.registry)
+        self.request_bytes = Histogram("fraud_request_bytes", "Predict request body size",
+                                       buckets=BYTE_BUCKETS, registry=self.registry)
+        self.batch_rows = Histogram("fraud_predict_batch_rows", "Rows per model call",
+                                    buckets=ROW_BUCKETS, registry=self.registry)
+        self._responses = Counter("fraud_requests", "Predict responses by status code", ["code"],
+                                  registry=self.registry)
+        self.model_load = Gauge("fraud_model_load_seconds", "Model load time", ["format"],
+                                registry=self.registry)
+
+    def time(self, stage: str):
+        return self.stages[stage].time()
+
+    def response(self, code: int) -> None:
+        self._responses.labels(str(code)).inc()
+
+    def render(self):
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+
+def timer(metrics, stage: str):
+    """`metrics.time(stage)`, or a no-op when metrics are disabled."""
+    return _NOOP if metrics is None else metrics.time(stage)
@@ -1,29 +1,335 @@
 # server.py
-import joblib
-import pandas as pd
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Dict, Any
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
 
-MODEL_PATH = "/app/fraud_pipeline_final.joblib"
+from fastapi import FastAPI, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+from batching import MicroBatcher  # noqa: E402
+from bundle import is_bundle, load_bundle  # noqa: E402
+from cache import PredictionCache  # noqa: E402
+from cpu_quota import cpu_quota  # noqa: E402
+from fastpath import compile_preprocessor  # noqa: E402
+from fingerprint import fingerprint  # noqa: E402
+from metrics import ServerMetrics, timer  # noqa: E402
+from workers import WorkerPool  # noqa: E402
+
+# Memory-mapped bundle written by `train.py --bundle_output`; preferred when
+# present. MODEL_PATH (joblib pickle) is the fallback.
+BUNDLE_PATH = os.getenv("BUNDLE_PATH", "/app/fraud_bundle")
+MODEL_PATH  = os.getenv("MODEL_PATH", "/app/fraud_pipeline_final.joblib")
+FAST_PATH   = os.getenv("FAST_PATH", "true").lower() == "true"
+
+# Micro-batching: merge concurrent requests into one predict call
+BATCHING          = os.getenv("BATCHING", "true").lower() == "true"
+BATCH_MAX_SIZE    = int(os.getenv("BATCH_MAX_SIZE", "256"))      # rows
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+
+# Worker pool: "0" = predict in this process, "auto" = one worker per CPU of
+# the container's quota, or an explicit number of pre-forked processes
+WORKERS         = os.getenv("WORKERS", "0").strip().lower()
+WORKER_MAX_ROWS = int(os.getenv("WORKER_MAX_ROWS", "1024"))    # shared-memory slot size
+
+# Prediction cache: per-row LRU keyed by feature hash + model fingerprint,
+# optionally backed by Redis (same keys) when REDIS_URL is set
+CACHE_ENABLED     = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
+REDIS_URL         = os.getenv("REDIS_URL", "").strip()
+
+# Prometheus /metrics: per-stage latency, batch/payload sizes, RSS.
+# "false" removes the route and every timer from the hot path.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 # load once
-bundle = joblib.load(MODEL_PATH)
-pre, clf = bundle['preprocessor'], bundle['model']
+t0 = time.perf_counter()
+if is_bundle(BUNDLE_PATH):
+    # no unpickling: only the manifest is parsed here; the preprocessor tables
+    # and forest arrays are mmap'd read-only by the first request that needs
+    # them (see preprocessor() / classifier())
+    bundle = load_bundle(BUNDLE_PATH)
+    MODEL_FORMAT = "bundle"
+    pre = compiled = clf = None
+    N_FEATURES = bundle.manifest["n_features"]
+    NUMERIC_COLUMNS = [c for e in bundle.manifest["preprocessor"]["numeric"] for c in e["columns"]]
+else:
+    import joblib
+    import pandas as pd
+
+    bundle = joblib.load(MODEL_PATH)
+    MODEL_FORMAT = "joblib"
+    pre, clf = bundle['preprocessor'], bundle['model']
+
+    # compile the preprocessor into lookup tables; fall back to pandas if the
+    # bundle contains transformers the fast path does not understand
+    compiled = None
+    if FAST_PATH:
+        try:
+            compiled = compile_preprocessor(pre)
+        except ValueError as e:
+            print(f"fast path disabled: {e}")
+    N_FEATURES = compiled.n_features if compiled is not None else clf.n_features_in_
+    NUMERIC_COLUMNS = [c for b in compiled.numeric_blocks for c in b.columns] if compiled is not None else []
+MODEL_LOAD_SECONDS = time.perf_counter() - t0
+print(f"model loaded from {MODEL_FORMAT} in {MODEL_LOAD_SECONDS * 1000:.1f} ms"
+      + (" (arrays are mapped on first use)" if MODEL_FORMAT == "bundle" else ""))
+
+
+
+def preprocessor():
+    """The compiled preprocessor, None for the pandas path."""
+    return bundle.preprocessor if MODEL_FORMAT == "bundle" else compiled
+
+
+def classifier():
+    """The sklearn forest, or the packed forest from the bundle."""
+    return bundle.forest if MODEL_FORMAT == "bundle" else clf
+
+
+def predict_labels(X):
+    # also the workers' predict function: a forked worker opens the bundle's
+    # forest itself, mapping the same page-cache pages as every other process
+    return classifier().predict(X)
+
+
+metrics = None
+if METRICS_ENABLED:
+    metrics = ServerMetrics()
+    metrics.model_load.labels(MODEL_FORMAT).set(MODEL_LOAD_SECONDS)
+
+cache = None
+if CACHE_ENABLED:
+    # a bundle carries its export-time hash; a joblib file is read in full anyway
+    model_fp = bundle.fingerprint if MODEL_FORMAT == "bundle" else fingerprint(MODEL_PATH)
+    cache = PredictionCache(model_fp, NUMERIC_COLUMNS, CACHE_MAX_ENTRIES, REDIS_URL, CACHE_TTL_SECONDS)
+
+
+# fork the workers now, after a joblib model is loaded, so they share its pages
+n_workers = cpu_quota() if WORKERS == "auto" else int(WORKERS)
+pool = None
+if n_workers > 0:
+    if hasattr(clf, "n_jobs"):
+        clf.n_jobs = 1   # parallelism comes from the processes, not joblib threads
+    pool = WorkerPool(predict_labels, n_workers, N_FEATURES, WORKER_MAX_ROWS)
+    print(f"started {n_workers} prediction workers")
+
+
+def predict_matrix(X):
+    if metrics is not None:
+        metrics.batch_rows.observe(X.shape[0])
+    with timer(metrics, "predict"):
+        if pool is not None:
+            return pool.predict(X).tolist()
+        return predict_labels(X).tolist()
+
+
+batcher = None
+if BATCHING:
+    batcher = MicroBatcher(predict_matrix, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+                           max_inflight=max(1, n_workers))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if batcher is not None:
+        batcher.start()
+    yield
+    if batcher is not None:
+        await batcher.stop()
+    if pool is not None:
+        pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
-app = FastAPI()
+def dense(X):
+    # the generic ColumnTransformer may return a scipy sparse matrix
+    return X.toarray() if hasattr(X, "toarray") else X
+
+
+def check_instances(rows):
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise ValueError("'instances' must be a list of objects")
+
+
+def check_columns(cols):
+    if not isinstance(cols, dict) or not all(isinstance(v, list) for v in cols.values()):
+        raise ValueError("'columns' must be an object of lists")
+    if len({len(v) for v in cols.values()}) > 1:
+        raise ValueError("all columns must have the same length")
+
+
+def encode(payload: dict):
+    """
+    Accepts either the row-oriented KServe V1 body
+        {"instances": [{"age": 48, ...}, ...]}
+    or a column-oriented body
+        {"columns": {"age": [48, ...], ...}}
+    and returns the model-ready feature matrix.
+    """
+    compiled = preprocessor()
+    if "instances" in payload:
+        rows = payload["instances"]
+        check_instances(rows)
+        if compiled is not None:
+            return compiled.encode_rows(rows)
+        return dense(pre.transform(pd.DataFrame(rows)))
+    if "columns" in payload:
+        cols = payload["columns"]
+        check_columns(cols)
+        if compiled is not None:
+            return compiled.encode_columns(cols)
+        return dense(pre.transform(pd.DataFrame(cols)))
+    raise ValueError("request must contain 'instances' or 'columns'")
+
+
+def payload_keys(payload: dict):
+    """Cache key per row of either payload shape (the cache keys rows individually)."""
+    if "instances" in payload:
+        rows = payload["instances"]
+        check_instances(rows)
+        return [cache.key(r) for r in rows]
+    if "columns" in payload:
+        cols = payload["columns"]
+        check_columns(cols)
+        return cache.keys_columns(cols)
+    raise ValueError("request must contain 'instances' or 'columns'")
+
+
+def payload_subset(payload: dict, idx):
+    """Rows `idx` of the payload, in its own shape (columns stay on the columnar path)."""
+    if "instances" in payload:
+        rows = payload["instances"]
+        return {"instances": [rows[i] for i in idx]}
+    return {"columns": {c: [v[i] for i in idx] for c, v in payload["columns"].items()}}
+
+
+def timed_encode(payload: dict):
+    with timer(metrics, "encode"):
+        return encode(payload)
+
+
+def score(payload: dict):
+    X_fe = timed_encode(payload)
+    if X_fe.shape[0] == 0:
+        return []
+    return predict_matrix(X_fe)
+
+
+async def score_async(payload: dict):
+    if batcher is None:
+        # Encode + predict, off the event loop
+        return await run_in_threadpool(score, payload)
+    # Encode this request, predict it together with its neighbours
+    X_fe = await run_in_threadpool(timed_encode, payload)
+    return await batcher.submit(X_fe)
+
+
+def cache_lookup(payload: dict):
+    with timer(metrics, "cache"):
+        keys = payload_keys(payload)
+        return keys, cache.get_many(keys)
+
+
+def cache_store(keys, values):
+    with timer(metrics, "cache"):
+        cache.put_many(keys, values)
 
-class BatchRequest(BaseModel):
-    instances: List[Dict[str, Any]]
 
 @app.post("/v1/models/insurance-fraud-custom:predict")
-def predict(req: BatchRequest):
-    # 1️⃣ Reconstruct the DataFrame with all original columns
-    df = pd.DataFrame(req.instances)
+async def predict(request: Request):
+    if metrics is None:
+        return await handle_predict(request)
+    t0 = time.perf_counter()
+    try:
+        response = await handle_predict(request)
+    except HTTPException as e:
+        metrics.response(e.status_code)
+        raise
+    metrics.request_seconds.observe(time.perf_counter() - t0)
+    metrics.response(200)
+    return response
+
+
+async def handle_predict(request: Request):
+    # 1️⃣ Parse the raw body ourselves (skips pydantic validation of every row)
+    body = await request.body()
+    if metrics is not None:
+        metrics.request_bytes.observe(len(body))
+    try:
+        with timer(metrics, "parse"):
+            payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid JSON body")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="request body must be a JSON object")
+
+    try:
+        if cache is None:
+            # 2️⃣ Encode + 3️⃣ predict
+            preds = await score_async(payload)
+        else:
+            # 2️⃣ Serve cached rows, 3️⃣ score only the misses
+            keys, preds = await run_in_threadpool(cache_lookup, payload)
+            miss = [i for i, p in enumerate(preds) if p is None]
+            if miss:
+                todo = payload if len(miss) == len(preds) else payload_subset(payload, miss)
+                fresh = await score_async(todo)
+                await run_in_threadpool(cache_store, [keys[i] for i in miss], fresh)
+                for i, p in zip(miss, fresh):
+                    preds[i] = p
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 4️⃣ Serialize here rather than in FastAPI, so it can be timed
+    if metrics is not None:
+        metrics.request_rows.observe(len(preds))
+    with timer(metrics, "serialize"):
+        content = json.dumps({"predictions": preds})
+    return Response(content=content, media_type="application/json")
+
+
+@app.get("/v1/models/insurance-fraud-custom")
+def model_metadata():
+    # KServe V1 model status, plus how the model was loaded
+    status = {
+        "name": "insurance-fraud-custom",
+        "ready": True,
+        "format": MODEL_FORMAT,
+        "load_ms": MODEL_LOAD_SECONDS * 1000.0,
+    }
+    if MODEL_FORMAT == "bundle":
+        # manifest at startup; preprocessor / forest once the first request opened them
+        status["load_ms_by_part"] = {k: v * 1000.0 for k, v in bundle.load_seconds.items()}
+    return status
+
+
+@app.get("/v1/models/insurance-fraud-custom/batching")
+def batching_stats():
+    # queue depth and batch-size histograms
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.stats()}
+
+
+@app.get("/v1/models/insurance-fraud-custom/cache")
+def cache_stats():
+    # hit / miss / eviction counters
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
-    # 2️⃣ Use your fitted preprocessor (with both numeric + OHE pipelines)
-    X_fe = pre.transform(df)
 
-    # 3️⃣ Predict
-    preds = clf.predict(X_fe).tolist()
-    return {"predictions": preds}
+if METRICS_ENABLED:
+    @app.get("/metrics")
+    def prometheus_metrics():
+        # Prometheus text exposition format
+        content, content_type = metrics.render()
+        return Response(content=content, media_type=content_type)
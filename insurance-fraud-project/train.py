@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 import argparse
-import pandas as pd
+import math
+import time
 import joblib
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from bundle import write_bundle
+from fastpath import check_parity as check_encoding, compile_preprocessor
+from features import load_frame, load_or_build
+from forest import PackedForest, check_parity
 
 def main():
     parser = argparse.ArgumentParser(description="Insurance Fraud Training (Katib‐ready)")
@@ -17,34 +25,105 @@ def main():
                         help="Number of trees")
     parser.add_argument('--max_depth',    type=int, default=0,
                         help="Max tree depth (0 means None)")
+    parser.add_argument('--bundle_output', type=str, default="",
+                        help="Optional directory for the memory-mapped .npy bundle")
+    parser.add_argument('--features_dir', type=str, default="",
+                        help="Optional cache of the transformed matrix (see features.py), "
+                             "reused while the CSV and preprocessor hashes match")
+    parser.add_argument('--metric',       type=str, default="oob",
+                        choices=["oob", "holdout", "train"],
+                        help="Reported accuracy: out-of-bag, held-out split, or training set")
+    parser.add_argument('--holdout_size', type=float, default=0.2,
+                        help="Held-out fraction for --metric=holdout")
+    parser.add_argument('--stages',       type=int, default=1,
+                        help="Grow the forest in this many warm-started stages, "
+                             "printing accuracy after each")
+    parser.add_argument('--budget',       type=float, default=1.0,
+                        help="Fraction of n_estimators to grow (successive-halving / Hyperband resource)")
+    parser.add_argument('--patience',     type=int, default=0,
+                        help="Stop after this many stages without improvement (0 = never)")
+    parser.add_argument('--min_delta',    type=float, default=0.002,
+                        help="Smallest accuracy gain that counts as an improvement")
     args = parser.parse_args()
 
-    # 1. Load cleaned data
-    df = pd.read_csv(args.clean_csv)
-    X = df.drop('fraud_reported', axis=1)
-    y = df['fraud_reported'].map({'Y':1,'N':0})
-
-    # 2. Load and apply preprocessor
+    # 1. Load the preprocessor
+    t0 = time.perf_counter()
     pre = joblib.load(args.prep_joblib)
-    X_fe = pre.transform(X)
 
-    # 3. Build & train RF with Katib params
+    # 2. Load cleaned data and transform it, or mmap the cached matrix
+    X = None
+    if args.features_dir:
+        X_fe, y, hit = load_or_build(args.features_dir, args.clean_csv, args.prep_joblib, pre)
+        source = "cached" if hit else "transformed and cached"
+    else:
+        X, y = load_frame(args.clean_csv)
+        X_fe = pre.transform(X)
+        source = "transformed"
+    print(f"features {source}: {X_fe.shape[0]}x{X_fe.shape[1]} in {time.perf_counter() - t0:.2f}s")
+
+    # 3. Hold out a split if that's what we report on
+    X_fit, y_fit, X_eval, y_eval = X_fe, y, X_fe, y
+    if args.metric == "holdout":
+        X_fit, X_eval, y_fit, y_eval = train_test_split(
+            X_fe, y, test_size=args.holdout_size, stratify=y, random_state=42)
+
+    # 4. Grow the RF in warm-started stages. Each stage adds trees to the
+    #    same forest (same seeds as one cold fit of the final size) and
+    #    prints an intermediate `accuracy=` line, so Katib's early stopping
+    #    can kill a hopeless trial after its first stages.
     depth = None if args.max_depth == 0 else args.max_depth
+    total = max(1, math.ceil(args.n_estimators * args.budget))
+    stages = max(1, min(args.stages, total))
     clf = RandomForestClassifier(
-        n_estimators=args.n_estimators,
         max_depth=depth,
         random_state=42,
-        n_jobs=-1
+        n_jobs=-1,
+        warm_start=True,
+        oob_score=args.metric == "oob"
     )
-    clf.fit(X_fe, y)
-
-    # 4. Evaluate on training (or a held-out split if you prefer)
-    acc = accuracy_score(y, clf.predict(X_fe))
-    # Katib expects a single line: <metric>=<value>
-    print(f"accuracy={acc}")
+    best, stale = -1.0, 0
+    t0 = time.perf_counter()
+    for stage in range(1, stages + 1):
+        clf.set_params(n_estimators=round(total * stage / stages))
+        clf.fit(X_fit, y_fit)
+        if args.metric == "oob":
+            acc = clf.oob_score_
+        else:
+            acc = accuracy_score(y_eval, clf.predict(X_eval))
+        print(f"stage {stage}/{stages}: {len(clf.estimators_)} trees in "
+              f"{time.perf_counter() - t0:.1f}s, {args.metric} accuracy")
+        # Katib expects a single line per report: <metric>=<value>
+        print(f"accuracy={acc}")
+        if acc > best + args.min_delta:
+            best, stale = acc, 0
+        else:
+            stale += 1
+            if args.patience and stale >= args.patience and stage < stages:
+                print(f"early stop: no gain above {args.min_delta} for {stale} stages")
+                break
 
     # 5. Persist the end‐to‐end bundle
     joblib.dump({'preprocessor': pre, 'model': clf}, args.model_output)
 
+    # 6. Optionally export the pickle-free bundle (manifest + .npy arrays) for
+    #    server.py, refusing to write it if it does not reproduce the joblib path
+    if args.bundle_output:
+        if X is None:
+            X, _ = load_frame(args.clean_csv)
+        compiled = compile_preprocessor(pre)
+        X_dense = X_fe.toarray() if hasattr(X_fe, "toarray") else np.asarray(X_fe)
+        if not np.array_equal(compiled.encode_columns(X.to_dict('list')), X_dense):
+            raise SystemExit("compiled preprocessor disagrees with pre.transform")
+        mismatches = check_encoding(compiled, pre, X)
+        if mismatches:
+            raise SystemExit(f"compiled preprocessor disagrees with pre.transform on {mismatches} "
+                             "rows with null values")
+        packed = PackedForest.from_sklearn(clf)
+        mismatches = check_parity(packed, clf, X_dense)
+        if mismatches:
+            raise SystemExit(f"packed forest disagrees with clf.predict on {mismatches} rows")
+        write_bundle(args.bundle_output, compiled, packed)
+        print(f"exported {packed.n_trees} trees / {packed.n_nodes} nodes to {args.bundle_output}")
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,147 @@
+# workers.py
+"""
+Pre-forked worker pool for CPU-bound predictions.
+
+The pool is forked *after* the model is loaded, so every worker shares the
+parent's pages copy-on-write (and the bundle's read-only mmaps through the
+page cache) instead of loading its own copy. Each worker owns a pair of
+shared-memory slots:
+
+    input   float32[max_rows, n_features]   feature matrix written by the parent
+    output  int64[max_rows]                  predicted labels written by the worker
+
+Only the row count and a status tuple cross the pipe, so a batch never gets
+pickled. Inputs are stored as float32, which is exactly what sklearn's trees
+(and forest.py) cast to before comparing thresholds.
+
+`WorkerPool.predict` blocks the calling thread until a worker is free and its
+answer is back; run it from a thread (run_in_threadpool / run_in_executor).
+
+A worker that dies (OOM kill, segfault) is replaced by a fresh fork with new
+shared-memory slots and its chunk is retried once; an exception raised by
+the predict function itself is reported as is, without a retry.
+"""
+import multiprocessing as mp
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _worker_main(predict_fn, conn, X_buf, out_buf):
+    while True:
+        n = conn.recv()
+        if n is None:
+            break
+        try:
+            out_buf[:n] = predict_fn(X_buf[:n])
+            conn.send(("ok", None))
+        except Exception as e:
+            conn.send(("err", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class WorkerDied(RuntimeError):
+    pass
+
+
+class _Worker:
+    def __init__(self, ctx, predict_fn, max_rows, n_features):
+        self.max_rows = max_rows
+        self.shm_in = shared_memory.SharedMemory(create=True, size=max_rows * n_features * 4)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=max_rows * 8)
+        self.X = np.ndarray((max_rows, n_features), dtype=np.float32, buffer=self.shm_in.buf)
+        self.out = np.ndarray((max_rows,), dtype=np.int64, buffer=self.shm_out.buf)
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(predict_fn, child, self.X, self.out),
+                                daemon=True)
+        self.proc.start()
+        child.close()
+
+    def run(self, X) -> np.ndarray:
+        if not self.proc.is_alive():
+            raise WorkerDied(f"worker {self.proc.pid} exited with {self.proc.exitcode}")
+        n = X.shape[0]
+        self.X[:n] = X
+        try:
+            self.conn.send(n)
+            status, err = self.conn.recv()
+        except (EOFError, OSError) as e:      # BrokenPipeError is an OSError
+            raise WorkerDied(f"worker {self.proc.pid} died: {type(e).__name__}") from e
+        if status != "ok":
+            raise RuntimeError(f"worker {self.proc.pid} failed: {err}")
+        return self.out[:n].copy()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.conn.close()
+        self.X = self.out = None
+        for shm in (self.shm_in, self.shm_out):
+            shm.close()
+            shm.unlink()
+
+
+class WorkerPool:
+    def __init__(self, predict_fn, n_workers, n_features, max_rows=1024):
+        self.n_workers = n_workers
+        self.max_rows = max_rows
+        self.n_features = n_features
+        self.predict_fn = predict_fn
+        self.ctx = mp.get_context("fork")      # fork: inherit the loaded model
+        self.workers = [self._spawn() for _ in range(n_workers)]
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self.idle = queue.Queue()
+        for w in self.workers:
+            self.idle.put(w)
+        # fans the chunks of one oversized batch out across workers
+        self._fanout = ThreadPoolExecutor(max_workers=n_workers)
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.ctx, self.predict_fn, self.max_rows, self.n_features)
+
+    def _replace(self, dead: _Worker) -> _Worker:
+        """Close a dead worker (pipe, slots) and fork a fresh one in its place."""
+        dead.close()
+        fresh = self._spawn()
+        with self._lock:
+            self.workers[self.workers.index(dead)] = fresh
+            self.restarts += 1
+        print(f"replaced dead prediction worker {dead.proc.pid} with {fresh.proc.pid}")
+        return fresh
+
+    def _run_chunk(self, X):
+        w = self.idle.get()
+        try:
+            try:
+                return w.run(X)
+            except WorkerDied:
+                w = self._replace(w)
+            # one retry on the fresh worker; a second death is the caller's error
+            try:
+                return w.run(X)
+            except WorkerDied:
+                w = self._replace(w)
+                raise
+        finally:
+            self.idle.put(w)
+
+    def predict(self, X) -> np.ndarray:
+        if X.shape[0] <= self.max_rows:
+            return self._run_chunk(X)
+        chunks = [X[i:i + self.max_rows] for i in range(0, X.shape[0], self.max_rows)]
+        return np.concatenate(list(self._fanout.map(self._run_chunk, chunks)))
+
+    def close(self):
+        self._fanout.shutdown()
+        for w in self.workers:
+            w.close()
+        self.workers = []
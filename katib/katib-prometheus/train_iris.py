@@ -1,20 +1,12 @@
 # /app/train_iris.py
-import argparse, os, time, json
+import argparse, os, sys, time, json
 from sklearn import datasets
 from sklearn.model_selection import train_test_split
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score
-from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
-
-def push_to_pg(addr, job, labels, metrics: dict):
-    if not addr:
-        return
-    reg = CollectorRegistry()
-    gauges = {k: Gauge(k, f"katib metric {k}", registry=reg) for k in metrics.keys()}
-    for k, v in metrics.items():
-        gauges[k].set(float(v))
-    # groupings (labels) show up as Prometheus labels on Pushgateway
-    push_to_gateway(addr, job=job, registry=reg, grouping_key=labels)
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from metrics_reporter import MetricsReporter  # noqa: E402
 
 def main():
     p = argparse.ArgumentParser()
@@ -23,16 +15,30 @@ def main():
     p.add_argument("--test_size", type=float, default=0.2)
     p.add_argument("--random_state", type=int, default=42)
     p.add_argument("--pushgateway", type=str, default=os.environ.get("PUSHGATEWAY_ADDR", ""))
+    p.add_argument("--push_interval", type=float, default=float(os.environ.get("PUSH_INTERVAL_SECONDS", "5")))
     args = p.parse_args()
 
+    # ---- Pushgateway for Prometheus: pushed in the background while training ----
+    trial_name = os.environ.get("KATIB_TRIAL_NAME", "local")  # provided by Katib in trial pods
+    labels = {
+        "dataset": "iris",
+        "algo": "svc_rbf",
+        "trial": trial_name
+    }
+    reporter = MetricsReporter(args.pushgateway, job="katib_trial_metrics",
+                               grouping_key=labels, interval=args.push_interval)
+
     iris = datasets.load_iris()
     X_train, X_test, y_train, y_test = train_test_split(
         iris.data, iris.target, test_size=args.test_size, random_state=args.random_state, stratify=iris.target
     )
 
     model = SVC(C=args.C, gamma=args.gamma, kernel="rbf", probability=False, random_state=args.random_state)
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
+    with reporter.timer("fit_duration_seconds"):
+        model.fit(X_train, y_train)
+    reporter.set("train_accuracy", model.score(X_train, y_train))
+    with reporter.timer("predict_duration_seconds"):
+        y_pred = model.predict(X_test)
 
     accuracy = accuracy_score(y_test, y_pred)
     precision = precision_score(y_test, y_pred, average="macro", zero_division=0)
@@ -44,17 +50,8 @@ def main():
     print(f"precision={precision}")
     print(f"recall={recall}")
 
-    # ---- Pushgateway for Prometheus ----
-    trial_name = os.environ.get("KATIB_TRIAL_NAME", "local")  # provided by Katib in trial pods
-    labels = {
-        "dataset": "iris",
-        "algo": "svc_rbf",
-        "trial": trial_name
-    }
-    metrics = {"accuracy": accuracy, "precision": precision, "recall": recall}
-    job = f"katib_trial_metrics"
-    if args.pushgateway:
-        push_to_pg(args.pushgateway, job, labels, metrics)
+    reporter.update({"accuracy": accuracy, "precision": precision, "recall": recall})
+    reporter.close()   # final push, bounded by the reporter's flush timeout
 
 if __name__ == "__main__":
     main()
@@ -9,13 +9,43 @@ suitable for Kubeflow Katib hyperparameter tuning. It splits the data into train
 and test sets, fits a sklearn LogisticRegression model with provided hyperparameters,
 and prints out the accuracy metric in Katib’s required format.
 
+Batch mode (--trials or --C-path) runs many trials in one process: the data is
+loaded once, trials that differ only in C are fitted as a path (strongest
+regularization first), and the paths run in parallel, one process per CPU of
+the container's quota. Each trial is fitted from scratch, so it reports what a
+single-trial run reports; --warm-start starts a trial from the previous
+converged fit instead, which is faster but can stop elsewhere within tol.
+--check refits every trial on its own and fails if any accuracy differs.
+
 Usage example:
     python3 train.py --penalty l2 --tol 0.001 --C 0.5 --max-iter 10
+
+    # 50 log-spaced C values between 0.01 and 10, in one process
+    python3 train.py --penalty l2 --tol 0.001 --max-iter 10 --C-path 0.01:10:50
+
+    # the same, warm-started, checked against single-trial fits
+    python3 train.py --penalty l2 --tol 0.001 --max-iter 10 --C-path 0.01:10:50 \
+        --warm-start --check
+
+    # explicit configs; missing keys take the values of the flags above
+    python3 train.py --penalty l2 --tol 0.001 --max-iter 10 \
+        --trials '[{"C": 0.01}, {"C": 0.5, "tol": 0.0001}, {"C": 1.0, "max_iter": 5}]'
+
+Runs from a checkout as is: <repo>/common (cpu_quota) is put on sys.path
+below; the image copies it next to this script.
 """
 
 import argparse         # For parsing command-line arguments
+import json             # Batch mode: trial configs
+import os               # Batch mode: --trials may be a file path
 import random           # Python’s built-in pseudo-random number generator
+import sys              # common/ on the import path
+import time             # Batch mode: sweep timing
 import warnings         # To suppress any non-critical warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+
 import numpy as np      # Fundamental package for numerical computations
 
 # sklearn provides datasets, model classes, and utility functions
@@ -24,6 +54,10 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score
 from sklearn.model_selection import train_test_split
 
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from cpu_quota import cpu_quota  # noqa: E402
+
 # -----------------------------------------------------------------------------------
 # GLOBAL CONSTANTS
 # -----------------------------------------------------------------------------------
@@ -38,6 +72,42 @@ random.seed(RANDOM_STATE)
 np.random.seed(RANDOM_STATE)
 
 
+def load_data():
+    """
+    Load Iris and split it into train/test sets.
+
+    Returns:
+        tuple: (X_train, X_test, y_train, y_test)
+    """
+    iris = datasets.load_iris()
+    X = iris.data    # feature matrix, shape = (150, 4)
+    y = iris.target  # target vector, shape = (150,)
+    return train_test_split(
+        X,
+        y,
+        test_size=0.2,         # 20% held out for testing
+        random_state=RANDOM_STATE
+    )
+
+
+def build_model(penalty: str, tol: float, C: float, max_iter: int,
+                warm_start: bool = False) -> LogisticRegression:
+    """
+    LogisticRegression with the given hyperparameters (lbfgs solver).
+
+    'none' is passed to sklearn as None, the spelling it accepts since 1.2.
+    """
+    return LogisticRegression(
+        penalty=None if penalty == "none" else penalty,
+        tol=tol,
+        C=C,
+        max_iter=max_iter,
+        random_state=RANDOM_STATE,
+        solver='lbfgs',        # default solver; supports l2 and none
+        warm_start=warm_start  # batch mode: start from the previous fit's coefficients
+    )
+
+
 def main(penalty: str, tol: float, C: float, max_iter: int) -> None:
     """
     Main training function.
@@ -57,28 +127,11 @@ def main(penalty: str, tol: float, C: float, max_iter: int) -> None:
         6. Compute and print accuracy in Katib format.
     """
     # 1. Load dataset from sklearn
-    iris = datasets.load_iris()
-    X = iris.data    # feature matrix, shape = (150, 4)
-    y = iris.target  # target vector, shape = (150,)
-
     # 2. Split into train and test sets
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=0.2,         # 20% held out for testing
-        random_state=RANDOM_STATE
-    )
+    X_train, X_test, y_train, y_test = load_data()
 
     # 3. Create LogisticRegression model with user-specified hyperparameters
-    clf = LogisticRegression(
-        penalty=penalty,
-        tol=tol,
-        C=C,
-        max_iter=max_iter,
-        random_state=RANDOM_STATE,
-        solver='lbfgs',        # default solver; supports l2 and none
-        multi_class='auto'     # automatically selects ‘ovr’ or ‘multinomial’
-    )
+    clf = build_model(penalty, tol, C, max_iter)
 
     # 4. Train the model
     clf.fit(X_train, y_train)
@@ -94,6 +147,151 @@ def main(penalty: str, tol: float, C: float, max_iter: int) -> None:
     print(f"accuracy={acc:.4f}")
 
 
+# -----------------------------------------------------------------------------------
+# BATCH MODE
+# -----------------------------------------------------------------------------------
+
+def load_trials(trials: str, C_path: str, defaults: dict) -> list:
+    """
+    Trial configs for batch mode.
+
+    Args:
+        trials (str): JSON list of {"penalty", "tol", "C", "max_iter"} objects,
+            inline or as a file path; missing keys take the values in `defaults`.
+        C_path (str): "lo:hi:n", n log-spaced C values with the default penalty,
+            tol and max_iter (used when `trials` is empty).
+        defaults (dict): Single-trial flag values.
+
+    Returns:
+        list: One dict per trial, with its position in the input as "id".
+    """
+    if trials:
+        if os.path.exists(trials):
+            with open(trials) as f:
+                trials = f.read()
+        configs = json.loads(trials)
+    else:
+        lo, hi, n = C_path.split(":")
+        configs = [{"C": float(c)} for c in np.logspace(np.log10(float(lo)), np.log10(float(hi)), int(n))]
+
+    result = []
+    for i, cfg in enumerate(configs):
+        t = {**defaults, **cfg}
+        if t["penalty"] not in ("l2", "none"):
+            # the lbfgs solver only supports these two
+            raise ValueError(f"trial {i}: unsupported penalty {t['penalty']!r}")
+        if t["C"] is None:
+            raise ValueError(f"trial {i}: no C given")
+        result.append({"id": i, "penalty": t["penalty"], "tol": float(t["tol"]),
+                       "C": float(t["C"]), "max_iter": int(t["max_iter"])})
+    return result
+
+
+def plan_paths(trials: list, n_workers: int) -> list:
+    """
+    Group trials that differ only in C into paths sorted by C, strongest
+    regularization first, so with --warm-start each fit starts from its
+    neighbour's coefficients. Long paths are halved until every worker has one.
+    """
+    groups = {}
+    for t in trials:
+        groups.setdefault((t["penalty"], t["tol"], t["max_iter"]), []).append(t)
+    paths = [sorted(g, key=lambda t: t["C"]) for g in groups.values()]
+    while len(paths) < n_workers:
+        longest = max(paths, key=len)
+        if len(longest) < 2:
+            break
+        paths.remove(longest)
+        half = len(longest) // 2
+        paths += [longest[:half], longest[half:]]
+    return paths
+
+
+# Train/test split shared with the sweep workers (inherited through fork)
+_data = None
+
+
+def run_path(path: list, warm_start: bool = False) -> list:
+    """
+    Fit one C path; one result per trial.
+
+    With warm_start each trial starts from the previous trial's coefficients,
+    but only when that fit converged: a fit stopped by max_iter is not an
+    optimum, and continuing from it would give the next trial more iterations
+    than it gets on its own, so the next trial starts cold instead.
+    """
+    X_train, X_test, y_train, y_test = _data
+    clf = None
+    results = []
+    for t in path:
+        if clf is None:
+            clf = build_model(t["penalty"], t["tol"], t["C"], t["max_iter"], warm_start=warm_start)
+        else:
+            clf.set_params(C=t["C"])
+        t0 = time.perf_counter()
+        clf.fit(X_train, y_train)
+        acc = accuracy_score(y_test, clf.predict(X_test))
+        n_iter = int(clf.n_iter_.max())
+        results.append({**t, "accuracy": acc, "n_iter": n_iter,
+                        "fit_ms": (time.perf_counter() - t0) * 1000.0})
+        if n_iter >= t["max_iter"]:
+            clf = None
+    return results
+
+
+def check_batch(results: list) -> list:
+    """Refit every trial on its own, as a single-trial run would; the results that differ."""
+    mismatches = []
+    for r in results:
+        single = run_path([r])[0]
+        if single["accuracy"] != r["accuracy"]:
+            mismatches.append((r, single["accuracy"]))
+    return mismatches
+
+
+def run_batch(trials: list, n_workers: int, warm_start: bool = False, check: bool = False) -> None:
+    """
+    Run every trial and print one tagged metric line per trial.
+
+    Katib's StdOut collector attributes every `accuracy=` line of a pod to that
+    pod's Katib trial, so each line is prefixed with its own trial id
+    (`trial-<id> ... accuracy=<value>`); set `metricStrategies: max` on the
+    experiment to make the pod's objective the best of its batch. The best
+    accuracy is repeated last for experiments using the default `latest`.
+    With check, the batch fails if any trial's accuracy differs from its
+    single-trial run.
+    """
+    global _data
+    _data = load_data()
+    paths = plan_paths(trials, n_workers)
+
+    t0 = time.perf_counter()
+    if n_workers <= 1 or len(paths) == 1:
+        results = [r for p in paths for r in run_path(p, warm_start)]
+    else:
+        with ProcessPoolExecutor(min(n_workers, len(paths)), mp_context=get_context("fork")) as pool:
+            results = [r for rs in pool.map(partial(run_path, warm_start=warm_start), paths) for r in rs]
+    elapsed = time.perf_counter() - t0
+
+    results.sort(key=lambda r: r["id"])
+    for r in results:
+        print(f"trial-{r['id']:03d} penalty={r['penalty']} tol={r['tol']:g} C={r['C']:.6g} "
+              f"max_iter={r['max_iter']} n_iter={r['n_iter']} accuracy={r['accuracy']:.4f}")
+    best = max(results, key=lambda r: r["accuracy"])
+    print(f"{len(results)} trials in {elapsed:.2f}s ({len(results) / elapsed:.1f} fits/s, "
+          f"{n_workers} workers); best trial-{best['id']:03d}")
+    print(f"accuracy={best['accuracy']:.4f}")
+
+    if check:
+        mismatches = check_batch(results)
+        for r, single in mismatches:
+            print(f"check: trial-{r['id']:03d} C={r['C']:.6g} batch accuracy {r['accuracy']:.4f} "
+                  f"!= single-trial {single:.4f}")
+        if mismatches:
+            raise SystemExit(f"check: {len(mismatches)} of {len(results)} trials differ from single-trial runs")
+        print(f"check: all {len(results)} trials match single-trial runs")
+
+
 if __name__ == "__main__":
     # -----------------------------------------------------------------------------------
     # COMMAND-LINE ARGUMENT PARSING
@@ -119,8 +317,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "--C",
         type=float,
-        required=True,
-        help="Inverse of regularization strength; smaller values = stronger regularization"
+        default=None,
+        help="Inverse of regularization strength; smaller values = stronger regularization "
+             "(required unless --C-path is given)"
     )
     parser.add_argument(
         "--max-iter",
@@ -129,8 +328,46 @@ if __name__ == "__main__":
         help="Maximum number of iterations for the solver to converge"
     )
 
-    # Parse the arguments and call main()
+    # Batch mode: many trials in one process
+    parser.add_argument(
+        "--trials",
+        type=str,
+        default="",
+        help="Batch mode: JSON list of {penalty, tol, C, max_iter} configs (inline or a file path)"
+    )
+    parser.add_argument(
+        "--C-path",
+        type=str,
+        default="",
+        help='Batch mode: "lo:hi:n" log-spaced C values for this penalty, tol and max-iter'
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Batch mode: parallel fit processes (0 = the container's CPU quota)"
+    )
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help="Batch mode: start each C from the previous converged fit (faster; "
+             "may differ from single-trial runs within tol)"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Batch mode: refit every trial on its own and fail if any accuracy differs"
+    )
+
+    # Parse the arguments and call main() (or run the batch)
     args = parser.parse_args()
+    if args.trials or args.C_path:
+        defaults = {"penalty": args.penalty, "tol": args.tol, "C": args.C, "max_iter": args.max_iter}
+        run_batch(load_trials(args.trials, args.C_path, defaults), args.workers or cpu_quota(),
+                  warm_start=args.warm_start, check=args.check)
+        raise SystemExit(0)
+    if args.C is None:
+        parser.error("--C is required unless --trials or --C-path is given")
     main(
         penalty=args.penalty,
         tol=args.tol,
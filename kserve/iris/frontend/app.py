@@ -1,7 +1,11 @@
 import os
-import requests
+import sys
 import streamlit as st
 
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "common"))
+import kserve_client  # noqa: E402  # pooled keep-alive session, retries on 503
+
 # Read the KServe URL from an env var (or hard‑code your service DNS)
 KSERVE_URL = os.environ.get(
     "KSERVE_URL",
@@ -28,7 +32,7 @@ if st.button("Predict"):
         sepal_length, sepal_width, petal_length, petal_width
     ]]}
     try:
-        resp = requests.post(KSERVE_URL, json=payload, timeout=5)
+        resp = kserve_client.post(KSERVE_URL, json=payload, timeout=5)
         resp.raise_for_status()
         preds = resp.json().get("predictions", [])
         if preds:
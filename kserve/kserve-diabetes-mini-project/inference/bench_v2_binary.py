@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+bench_v2_binary.py
+
+Compares the V2 JSON body against the V2 binary tensor extension for the
+diabetes predictor: request/response size and end-to-end latency (encode,
+POST, decode) across batch sizes. Rows are tiled from pipelines/data/diabetes.csv.
+
+Usage (with the predictor port-forwarded, see test.sh):
+    python3 bench_v2_binary.py \
+        --url http://localhost:8080/v2/models/diabetes-s3-model-serving/infer \
+        --batch-sizes 1 10 100 1000 10000 --repeats 20
+
+    # no server: only payload sizes and client-side encode cost
+    python3 bench_v2_binary.py --codec-only
+"""
+import argparse
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "..", "common"))
+import v2_codec  # noqa: E402
+
+DEFAULT_CSV = os.path.join(HERE, "..", "..", "..", "pipelines", "data", "diabetes.csv")
+
+
+def load_rows(path):
+    with open(path) as f:
+        reader = csv.reader(f)
+        next(reader)
+        return np.array([[float(x) for x in row[:8]] for row in reader], dtype=np.float32)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def bench(session, url, batch, binary, repeats, input_name, codec_only):
+    req_bytes = resp_bytes = 0
+    latencies = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        body, headers = v2_codec.encode_request(input_name, batch, "FP32", binary=binary)
+        req_bytes = len(body)
+        if not codec_only:
+            resp = session.post(url, data=body, headers=headers, timeout=60)
+            resp.raise_for_status()
+            v2_codec.decode_response(resp.content, resp.headers)
+            resp_bytes = len(resp.content)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "mode": "binary" if binary else "json",
+        "batch": int(batch.shape[0]),
+        "request_bytes": req_bytes,
+        "response_bytes": resp_bytes,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="V2 JSON vs binary tensor benchmark")
+    p.add_argument("--url", default="http://localhost:8080/v2/models/diabetes-s3-model-serving/infer")
+    p.add_argument("--csv", default=DEFAULT_CSV)
+    p.add_argument("--input-name", default="predict")
+    p.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    p.add_argument("--repeats", type=int, default=20)
+    p.add_argument("--codec-only", action="store_true", help="skip HTTP, measure encoding only")
+    p.add_argument("--json-out", default="", help="optional path for the results as JSON")
+    args = p.parse_args()
+
+    rows = load_rows(args.csv)
+    session = requests.Session()
+    results = []
+    for n in args.batch_sizes:
+        batch = np.resize(rows, (n, 8))
+        for binary in (False, True):
+            results.append(bench(session, args.url, batch, binary, args.repeats,
+                                 args.input_name, args.codec_only))
+
+    print(f"{'batch':>7} {'mode':>7} {'req KB':>9} {'resp KB':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(f"{r['batch']:>7} {r['mode']:>7} {r['request_bytes'] / 1024:>9.1f} "
+              f"{r['response_bytes'] / 1024:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}")
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
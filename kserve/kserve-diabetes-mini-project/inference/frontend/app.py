@@ -1,8 +1,14 @@
-import os, json, time, hmac, hashlib
+import os, io, json, sys, time, hmac, hashlib, queue, threading
 import requests
+import pandas as pd
 import streamlit as st
 import redis
 
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "common"))
+import kserve_client  # noqa: E402  # pooled keep-alive session, retries on 503, latency stats
+import v2_codec       # noqa: E402  # V2 JSON / binary tensor extension
+
 # ---------------- Config via ConfigMap/Env ----------------
 INFERENCE_URL     = os.getenv("INFERENCE_URL", "").strip()
 INFERENCE_BASE    = os.getenv("INFERENCE_BASE", "").rstrip("/")
@@ -21,6 +27,17 @@ CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))  # 24h default
 CACHE_ENABLED     = os.getenv("CACHE_ENABLED", "true").lower() == "true"
 CACHE_SECRET      = os.getenv("CACHE_SECRET", "change-me")  # used to HMAC the key
 
+# Bulk scoring
+BINARY_TENSORS    = os.getenv("BINARY_TENSORS", "true").lower() == "true"  # V2 binary extension
+BULK_MAX_ROWS     = int(os.getenv("BULK_MAX_ROWS", "10000"))    # rows per /infer call
+MGET_CHUNK        = int(os.getenv("MGET_CHUNK", "1000"))        # keys per MGET (all in one pipeline)
+WRITE_BATCH       = int(os.getenv("WRITE_BATCH", "1000"))       # SETs per write-behind pipeline
+
+FEATURE_NAMES = ["Pregnancies", "Glucose", "BloodPressure", "SkinThickness",
+                 "Insulin", "BMI", "DiabetesPedigreeFunction", "Age"]
+# same types the single-row form sends, so both paths hash to the same keys
+FEATURE_TYPES = [int, float, float, float, float, float, float, int]
+
 # ---------------- Helpers ----------------
 def build_infer_url() -> str:
     if INFERENCE_URL:
@@ -62,6 +79,57 @@ def get_redis():
     except Exception:
         return None  # app will continue without cache
 
+class CacheWriter:
+    """
+    Write-behind for cache records: callers enqueue and return immediately,
+    a daemon thread drains the queue and flushes up to WRITE_BATCH SETs per
+    pipeline (one round trip). Best effort: if Redis is down or the queue is
+    full, records are dropped and the next request simply misses.
+    """
+    def __init__(self, r, ttl_seconds):
+        self.r = r
+        self.ttl = ttl_seconds if ttl_seconds > 0 else None
+        self.q = queue.Queue(maxsize=100_000)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def put(self, key, record):
+        try:
+            self.q.put_nowait((key, json.dumps(record)))
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            batch = [self.q.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                pipe = self.r.pipeline(transaction=False)
+                for key, value in batch:
+                    pipe.set(key, value, ex=self.ttl)
+                pipe.execute()
+            except Exception:
+                pass
+
+@st.cache_resource(show_spinner=False)
+def get_writer():
+    r = get_redis()
+    return CacheWriter(r, CACHE_TTL_SECONDS) if r else None
+
+def mget_records(r, keys):
+    """Cached records for all keys: chunked MGETs sent in a single pipeline."""
+    pipe = r.pipeline(transaction=False)
+    for i in range(0, len(keys), MGET_CHUNK):
+        pipe.mget(keys[i:i + MGET_CHUNK])
+    values = [v for chunk in pipe.execute() for v in chunk]
+    return [json.loads(v) if v else None for v in values]
+
+def row_features(values):
+    return [t(v) for t, v in zip(FEATURE_TYPES, values)]
+
 def infer_remote(features):
     payload = {
         "inputs": [
@@ -70,12 +138,108 @@ def infer_remote(features):
     }
     url = build_infer_url()
     t0 = time.time()
-    resp = requests.post(url, json=payload, timeout=TIMEOUT_SECONDS, verify=VERIFY_TLS,
-                         headers={"Content-Type": "application/json"})
+    resp = kserve_client.post(url, json=payload, timeout=TIMEOUT_SECONDS, verify=VERIFY_TLS,
+                              headers={"Content-Type": "application/json"})
     latency = (time.time() - t0) * 1000.0
     resp.raise_for_status()
     return resp.json(), latency, payload, url
 
+@st.cache_resource(show_spinner=False)
+def binary_state():
+    # flips to False (for this pod) the first time the server rejects binary
+    return {"enabled": BINARY_TENSORS}
+
+def rejects_binary(resp):
+    # 415, or a 400/422 that names the binary extension; other client errors
+    # (bad shape, wrong input name) would fail the same way as JSON
+    if resp.status_code == 415:
+        return True
+    return resp.status_code in (400, 422) and "binary" in resp.text.lower()
+
+def infer_remote_batch(rows):
+    """
+    Score k feature vectors with one V2 call carrying a [k, 8] tensor.
+    Uses the V2 binary tensor extension (raw little-endian buffers) when
+    enabled, and falls back to JSON if the server rejects it.
+    """
+    state = binary_state()
+    url = build_infer_url()
+    t0 = time.time()
+    if state["enabled"]:
+        body, headers = v2_codec.encode_request(INPUT_NAME, rows, INPUT_DATATYPE, binary=True)
+        resp = kserve_client.post(url, data=body, headers=headers,
+                                  timeout=TIMEOUT_SECONDS, verify=VERIFY_TLS)
+        if rejects_binary(resp):
+            state["enabled"] = False
+    if not state["enabled"]:
+        body, headers = v2_codec.encode_request(INPUT_NAME, rows, INPUT_DATATYPE, binary=False)
+        resp = kserve_client.post(url, data=body, headers=headers,
+                                  timeout=TIMEOUT_SECONDS, verify=VERIFY_TLS)
+    latency = (time.time() - t0) * 1000.0
+    resp.raise_for_status()
+    result = v2_codec.decode_response(resp.content, resp.headers)
+    for out in result.get("outputs", []):
+        if hasattr(out.get("data"), "ravel"):
+            out["data"] = out["data"].ravel().tolist()
+    return result, latency
+
+def split_outputs(result_json, k):
+    """Per-row output vectors from a V2 response for k rows."""
+    out0 = result_json["outputs"][0]
+    data = out0["data"]
+    flat = [x for row in data for x in row] if data and isinstance(data[0], list) else list(data)
+    width = len(flat) // k if k else 0
+    if width == 0 or width * k != len(flat):
+        raise ValueError(f"cannot split {len(flat)} output values into {k} rows")
+    return out0, [flat[i * width:(i + 1) * width] for i in range(k)]
+
+def parse_row(vec):
+    """(pred_label, prob) for one row's output vector."""
+    if len(vec) == 2:
+        prob = float(vec[1])
+        return (1 if prob >= 0.5 else 0), prob
+    if len(vec) == 1:
+        val = float(vec[0])
+        if val in (0.0, 1.0):
+            return int(val), None
+        return (1 if val >= 0.5 else 0), val
+    return None, None
+
+def score_bulk(rows, r, writer, bypass_cache):
+    """
+    Score many rows with a few round trips: one pipelined MGET for the cache,
+    then one /infer call per BULK_MAX_ROWS misses. Cache writes go to the
+    write-behind queue.
+    """
+    keys = [cache_key(f) for f in rows]
+    records = mget_records(r, keys) if (r and not bypass_cache) else [None] * len(rows)
+    hits = sum(rec is not None for rec in records)
+    round_trips = 1 if (r and not bypass_cache) else 0
+
+    miss = [i for i, rec in enumerate(records) if rec is None]
+    for start in range(0, len(miss), BULK_MAX_ROWS):
+        chunk = miss[start:start + BULK_MAX_ROWS]
+        result_json, latency_ms = infer_remote_batch([rows[i] for i in chunk])
+        round_trips += 1
+        out0, vectors = split_outputs(result_json, len(chunk))
+        for i, vec in zip(chunk, vectors):
+            pred_label, prob = parse_row(vec)
+            records[i] = {
+                "model": MODEL_NAME,
+                "version": MODEL_VERSION,
+                "features": stable_features(rows[i]),
+                # per-row slice, same shape as a single-row response
+                "result_json": {"outputs": [{"name": out0.get("name"), "datatype": out0.get("datatype"),
+                                             "shape": [1, len(vec)], "data": vec}]},
+                "pred_label": pred_label,
+                "prob": prob,
+                "latency_ms": latency_ms,
+                "stored_at": int(time.time()),
+            }
+            if writer:
+                writer.put(keys[i], records[i])
+    return records, hits, round_trips
+
 # ---------------- UI ----------------
 st.set_page_config(page_title="Diabetes Inference (Cached)", page_icon="⚡", layout="centered")
 st.title("⚡ Diabetes Risk Inference with Caching")
@@ -87,6 +251,37 @@ with st.expander("Connection details", expanded=False):
         f"REDIS_HOST={REDIS_HOST}:{REDIS_PORT} (db {REDIS_DB})\nCACHE_ENABLED={CACHE_ENABLED} TTL={CACHE_TTL_SECONDS}s",
         language="bash",
     )
+    st.caption("Client latency per endpoint (this pod)")
+    st.json(kserve_client.stats())
+
+with st.expander("Bulk scoring (CSV upload)", expanded=False):
+    st.caption("CSV with the 8 feature columns (" + ", ".join(FEATURE_NAMES) + "); "
+               "extra columns such as Outcome are ignored.")
+    upload = st.file_uploader("Feature CSV", type=["csv"])
+    bulk_bypass = st.toggle("Bypass cache for bulk", value=False)
+    if upload is not None and st.button("Score CSV", use_container_width=True):
+        try:
+            df = pd.read_csv(upload)
+            feats = df[FEATURE_NAMES] if set(FEATURE_NAMES) <= set(df.columns) else df.iloc[:, :8]
+            rows = [row_features(v) for v in feats.itertuples(index=False, name=None)]
+            r = get_redis() if CACHE_ENABLED else None
+            writer = get_writer() if CACHE_ENABLED else None
+            t0 = time.time()
+            records, hits, round_trips = score_bulk(rows, r, writer, bulk_bypass)
+            elapsed = time.time() - t0
+            out = feats.copy()
+            out["pred_label"] = [rec["pred_label"] for rec in records]
+            out["prob"] = [rec["prob"] for rec in records]
+            st.success(f"Scored {len(rows)} rows in {elapsed * 1000:.0f} ms · "
+                       f"{hits} cached · {len(rows) - hits} inferred · {round_trips} round trips")
+            st.dataframe(out, use_container_width=True)
+            buf = io.StringIO()
+            out.to_csv(buf, index=False)
+            st.download_button("Download predictions", buf.getvalue(), "predictions.csv", "text/csv")
+        except requests.HTTPError as e:
+            st.error(f"HTTP error: {e.response.status_code} {e.response.text}")
+        except Exception as e:
+            st.error(f"Error: {e}")
 
 # Inputs
 col1, col2 = st.columns(2)
@@ -168,8 +363,9 @@ if st.button("Run Inference", use_container_width=True):
         if prob is not None:
             st.write(f"Probability: **{prob:.3f}**")
 
-        # Save to cache
-        if r:
+        # Save to cache (write-behind, off the latency path)
+        writer = get_writer() if r else None
+        if writer:
             record = {
                 "model": MODEL_NAME,
                 "version": MODEL_VERSION,
@@ -180,7 +376,7 @@ if st.button("Run Inference", use_container_width=True):
                 "latency_ms": latency_ms,
                 "stored_at": int(time.time()),
             }
-            r.set(key, json.dumps(record), ex=CACHE_TTL_SECONDS if CACHE_TTL_SECONDS > 0 else None)
+            writer.put(key, record)
 
         with st.expander("Request sent", expanded=False):
             st.code(json.dumps(sent_payload, indent=2), language="json")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+loadtest.py
+
+Open-loop load test for the KServe predictors in this repo: iris
+(kserve/iris), diabetes (kserve-diabetes-mini-project) and the insurance
+fraud custom predictor (insurance-fraud-project/server.py).
+
+Requests are fired on a fixed schedule (rate R -> one request every 1/R s)
+whether or not earlier ones have returned, so a slow server shows up as
+growing latency instead of a politely lower request rate. Latency is measured
+from each request's *scheduled* send time, which keeps queueing inside the
+client (all --concurrency connections busy) in the numbers.
+
+Each rate in --rates runs for --duration seconds. A step is sustainable when
+the achieved rate is within 5% of the offered one, under 1% of requests fail
+and p99 stays within --slo-p99-ms; the highest such rate is reported as
+max_sustainable_rps. Rates after the first unsustainable one are skipped.
+
+Payloads cycle through:
+    iris       the iris test split (same split as iris/iris-complete-test.py)
+    diabetes   pipelines/data/diabetes.csv feature columns
+    fraud      --data <claims CSV> (e.g. insurance_fraud_cleaned.csv from
+               MinIO), else the sample claim from test-model.sh
+
+Payloads repeat once every row has been sent, so a predictor with a response
+cache would mostly serve hits; turn it off to measure scoring (the fraud
+server's CACHE_ENABLED=false).
+
+Usage:
+    # fraud, against a local stand-in predictor with its response cache off
+    (cd insurance-fraud-project && CACHE_ENABLED=false uvicorn server:app --port 8080) &
+    python3 kserve/loadtest.py --target fraud --rates 50,100,200,400 --duration 10
+
+    # diabetes, V2 with binary tensors, through a port-forward
+    python3 kserve/loadtest.py --target diabetes --protocol v2 --binary \\
+        --rates 20,50,100 --json-out diabetes-v2.json
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "common"))
+import v2_codec  # noqa: E402
+
+# request path, model name, V2 input tensor name/datatype per target
+TARGETS = {
+    "iris":     {"model": "1", "v2_input": "input-0", "datatype": "FP64"},
+    "diabetes": {"model": "diabetes-s3-model-serving", "v2_input": "predict", "datatype": "FP32"},
+    "fraud":    {"model": "insurance-fraud-custom", "v2_input": None, "datatype": None},
+}
+
+SAMPLE_CLAIM = {
+    "months_as_customer": 328, "age": 48, "policy_state": "OH", "policy_csl": "250/500",
+    "policy_deductable": 1000, "policy_annual_premium": 1406.91, "umbrella_limit": 0,
+    "insured_zip": 466132, "insured_sex": "MALE", "insured_education_level": "MD",
+    "insured_occupation": "craft-repair", "insured_hobbies": "sleeping",
+    "insured_relationship": "husband", "capital-gains": 53300, "capital-loss": 0,
+    "incident_type": "Single Vehicle Collision", "collision_type": "Side Collision",
+    "incident_severity": "Major Damage", "authorities_contacted": "Police",
+    "incident_state": "SC", "incident_city": "Columbus", "incident_hour_of_the_day": 5,
+    "number_of_vehicles_involved": 1, "property_damage": "YES", "bodily_injuries": 1,
+    "witnesses": 2, "police_report_available": "YES", "total_claim_amount": 71610,
+    "injury_claim": 6510, "property_claim": 13020, "vehicle_claim": 52080,
+    "auto_make": "Saab", "auto_model": "92x", "auto_year": 2004,
+}
+
+
+def load_rows(target, data):
+    """Rows to replay: a float matrix for iris/diabetes, claim dicts for fraud."""
+    if target == "iris":
+        from sklearn.datasets import load_iris
+        from sklearn.model_selection import train_test_split
+
+        X, y = load_iris(return_X_y=True)
+        _, X_test, _, _ = train_test_split(X, y, test_size=0.2, random_state=1337)
+        return X_test
+    if target == "diabetes":
+        path = data or os.path.join(ROOT, "pipelines", "data", "diabetes.csv")
+        with open(path) as f:
+            reader = csv.reader(f)
+            next(reader)
+            return np.array([[float(x) for x in row[:8]] for row in reader])
+    if not data:
+        return [SAMPLE_CLAIM]
+    import pandas as pd
+
+    df = pd.read_csv(data).drop(columns=["fraud_reported"], errors="ignore")
+    return json.loads(df.to_json(orient="records"))
+
+
+def build_payloads(target, protocol, rows, batch, binary, count=None):
+    """Pre-encoded (path, body, headers) tuples, by default covering every row once."""
+    spec = TARGETS[target]
+    model = spec["model"]
+    if count is None:
+        count = max(1, math.ceil(len(rows) / batch))
+    payloads = []
+    for i in range(count):
+        idx = [(i * batch + j) % len(rows) for j in range(batch)]
+        if protocol == "v1":
+            instances = [rows[k] for k in idx] if target == "fraud" else rows[idx].tolist()
+            body = json.dumps({"instances": instances}).encode()
+            payloads.append((f"/v1/models/{model}:predict", body,
+                             {"Content-Type": "application/json"}))
+        else:
+            body, headers = v2_codec.encode_request(spec["v2_input"], rows[idx], spec["datatype"],
+                                                    binary=binary)
+            payloads.append((f"/v2/models/{model}/infer", body, headers))
+    return payloads
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))], 3)
+
+
+class Step:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.status = {}
+
+    def record(self, ms, code):
+        with self.lock:
+            self.status[code] = self.status.get(code, 0) + 1
+            if code == 200:
+                self.latencies.append(ms)
+            else:
+                self.errors += 1
+
+
+def run_step(session, base_url, payloads, rate, duration, concurrency, timeout):
+    step = Step()
+    interval = 1.0 / rate
+    n_requests = max(1, int(rate * duration))
+
+    def fire(i, scheduled):
+        path, body, headers = payloads[i % len(payloads)]
+        try:
+            code = session.post(base_url + path, data=body, headers=headers, timeout=timeout).status_code
+        except requests.RequestException as e:
+            code = type(e).__name__
+        step.record((time.perf_counter() - scheduled) * 1000.0, code)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        for i in range(n_requests):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, i, scheduled)
+    elapsed = time.perf_counter() - start
+
+    lat = step.latencies
+    ok = len(lat)
+    return {
+        "offered_rps": rate,
+        "achieved_rps": round(ok / elapsed, 2),
+        "requests": n_requests,
+        "ok": ok,
+        "errors": step.errors,
+        "status": {str(k): v for k, v in step.status.items()},
+        "p50_ms": percentile(lat, 50),
+        "p95_ms": percentile(lat, 95),
+        "p99_ms": percentile(lat, 99),
+        "max_ms": round(max(lat), 3) if lat else None,
+        "mean_ms": round(statistics.fmean(lat), 3) if lat else None,
+    }
+
+
+def sustainable(result, slo_p99_ms):
+    return (result["achieved_rps"] >= 0.95 * result["offered_rps"]
+            and result["errors"] <= 0.01 * result["requests"]
+            and result["p99_ms"] is not None and result["p99_ms"] <= slo_p99_ms)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Open-loop load test for the KServe predictors")
+    p.add_argument("--target", choices=sorted(TARGETS), required=True)
+    p.add_argument("--url", default="http://localhost:8080", help="predictor base URL")
+    p.add_argument("--protocol", choices=["v1", "v2"], default="v1")
+    p.add_argument("--binary", action="store_true", help="V2 binary tensor extension")
+    p.add_argument("--model", default="", help="override the model name in the path")
+    p.add_argument("--data", default="", help="CSV to replay (fraud claims / diabetes rows)")
+    p.add_argument("--batch", type=int, default=1, help="rows per request")
+    p.add_argument("--rates", default="10,20,50,100,200", help="comma-separated requests/sec steps")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds per rate step")
+    p.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    p.add_argument("--timeout", type=float, default=10.0)
+    p.add_argument("--slo-p99-ms", type=float, default=500.0)
+    p.add_argument("--warmup", type=int, default=20, help="unmeasured requests before the first step")
+    p.add_argument("--json-out", default="", help="also write the report to this file")
+    args = p.parse_args()
+
+    if args.protocol == "v2" and TARGETS[args.target]["v2_input"] is None:
+        p.error(f"{args.target} only serves the V1 protocol")
+    if args.model:
+        TARGETS[args.target]["model"] = args.model
+
+    rows = load_rows(args.target, args.data)
+    payloads = build_payloads(args.target, args.protocol, rows, args.batch, args.binary)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    for i in range(args.warmup):
+        path, body, headers = payloads[i % len(payloads)]
+        session.post(args.url + path, data=body, headers=headers, timeout=args.timeout)
+
+    steps, best = [], None
+    for rate in [float(r) for r in args.rates.split(",") if r]:
+        result = run_step(session, args.url.rstrip("/"), payloads, rate, args.duration,
+                          args.concurrency, args.timeout)
+        result["sustainable"] = sustainable(result, args.slo_p99_ms)
+        steps.append(result)
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        print(f"{rate:>8.1f} rps offered  {result['achieved_rps']:>8.1f} achieved  "
+              f"p50 {fmt(result['p50_ms'])}  p95 {fmt(result['p95_ms'])}  "
+              f"p99 {fmt(result['p99_ms'])}  max {fmt(result['max_ms'])} ms  "
+              f"errors {result['errors']}{'' if result['sustainable'] else '  (unsustainable)'}",
+              file=sys.stderr)
+        if not result["sustainable"]:
+            break
+        best = rate
+
+    report = {
+        "target": args.target,
+        "url": args.url,
+        "protocol": args.protocol + ("-binary" if args.protocol == "v2" and args.binary else ""),
+        "model": TARGETS[args.target]["model"],
+        "batch": args.batch,
+        "duration_s": args.duration,
+        "concurrency": args.concurrency,
+        "slo_p99_ms": args.slo_p99_ms,
+        "max_sustainable_rps": best,
+        "steps": steps,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# s3_transfer.py
+"""
+Parallel S3/MinIO directory transfers for the custom-llm pipeline components
+(train_lora, eval_simple_accuracy, merge_lora_to_base). Baked into the
+custom-llm-trainer image (see Containerfile) so the components can import it.
+
+    s3 = make_client(s3_endpoint, s3_access_key, s3_secret_key)
+    xfer = S3Transfer(s3)
+    xfer.upload_dir("/outputs/peft", bucket, "models/tiny-sft-peft")
+    xfer.download_prefix(bucket, "models/tiny-sft-peft", "/tmp/peft")
+
+  * one client per component with a connection pool sized for
+    `workers` files x `part_concurrency` parts in flight
+  * files above `chunk_mb` go up/down as multipart transfers of `chunk_mb`
+    parts (boto3's TransferConfig), several files at a time
+  * an object is skipped when the other side already has the same size and
+    ETag. The local ETag is computed the way S3 does it: plain MD5, or for
+    multipart objects MD5 of the part MD5s plus "-<parts>", using the
+    object's real part size (HEAD of part 1), so objects uploaded with any
+    chunk_mb are matched.
+  * every call logs and returns files, skipped, bytes and MB/s
+
+Try it against a local MinIO or moto server:
+    moto_server -p 9000 &
+    python3 s3_transfer.py --endpoint localhost:9000 upload ./peft s3://custom-llm/models/x
+    python3 s3_transfer.py --endpoint localhost:9000 download s3://custom-llm/models/x /tmp/x
+"""
+import argparse
+import hashlib
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+MB = 1024 * 1024
+READ_BLOCK = 8 * MB
+
+
+def endpoint_url(s3_endpoint: str) -> str:
+    return ("http://" + s3_endpoint) if not s3_endpoint.startswith("http") else s3_endpoint
+
+
+def parse_s3(uri: str):
+    # "s3://bucket/prefix..." -> ("bucket", "prefix...")
+    assert uri.startswith("s3://")
+    bkt, _, key = uri[5:].partition("/")
+    return bkt, key
+
+
+def make_client(s3_endpoint: str, access_key: str, secret_key: str, max_pool_connections: int = 64):
+    return boto3.client(
+        "s3",
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        endpoint_url=endpoint_url(s3_endpoint),
+        region_name="us-east-1",
+        verify=False,
+        config=Config(max_pool_connections=max_pool_connections,
+                      retries={"max_attempts": 5, "mode": "adaptive"},
+                      s3={"addressing_style": "path"}),
+    )
+
+
+def local_etag(path: str, size: int, chunk_size: int, threshold: int) -> str:
+    """The ETag S3 would report for this file uploaded with these settings."""
+    if size < threshold:
+        h = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(READ_BLOCK), b""):
+                h.update(block)
+        return h.hexdigest()
+    digests = []
+    with open(path, "rb") as f:
+        while True:
+            h = hashlib.md5()
+            remaining = chunk_size
+            while remaining:
+                block = f.read(min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                h.update(block)
+                remaining -= len(block)
+            if remaining == chunk_size:
+                break
+            digests.append(h.digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class S3Transfer:
+    def __init__(self, client, workers: int = 8, part_concurrency: int = 8, chunk_mb: int = 64):
+        self.s3 = client
+        self.workers = workers
+        self.chunk_size = chunk_mb * MB
+        self.config = TransferConfig(multipart_threshold=self.chunk_size,
+                                     multipart_chunksize=self.chunk_size,
+                                     max_concurrency=part_concurrency,
+                                     use_threads=True)
+
+    def list_objects(self, bucket: str, prefix: str) -> dict:
+        """key -> (size, etag) for every object under prefix."""
+        objects = {}
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                objects[obj["Key"]] = (obj["Size"], obj["ETag"].strip('"'))
+        return objects
+
+    def same(self, path: str, size: int, etag: str, bucket: str, key: str) -> bool:
+        """True if the local file matches the object bucket/key of this size and ETag."""
+        try:
+            if os.path.getsize(path) != size:
+                return False
+        except OSError:
+            return False
+        if "-" not in etag:
+            return local_etag(path, size, size, size + 1) == etag
+        # multipart: every part but the last has the size of part 1, whatever
+        # chunk_mb the uploader used
+        try:
+            chunk_size = self.s3.head_object(Bucket=bucket, Key=key, PartNumber=1)["ContentLength"]
+        except ClientError:
+            return False
+        parts = int(etag.rsplit("-", 1)[1])
+        return math.ceil(size / chunk_size) == parts and local_etag(path, size, chunk_size, 0) == etag
+
+    def _run(self, verb, jobs, total_files):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            moved = list(pool.map(lambda job: job(), jobs))
+        elapsed = time.perf_counter() - t0
+        nbytes = sum(b for b in moved if b)
+        stats = {"files": total_files, "transferred": sum(1 for b in moved if b is not None),
+                 "skipped": sum(1 for b in moved if b is None), "bytes": nbytes,
+                 "seconds": round(elapsed, 3),
+                 "mb_per_sec": round(nbytes / MB / elapsed, 2) if elapsed > 0 else 0.0}
+        print(f"s3 {verb}: {stats['transferred']} of {total_files} files "
+              f"({stats['skipped']} unchanged), {nbytes / MB:.1f} MB in {elapsed:.2f}s, "
+              f"{stats['mb_per_sec']:.1f} MB/s")
+        return stats
+
+    def upload_dir(self, local_dir: str, bucket: str, prefix: str) -> dict:
+        prefix = prefix.rstrip("/")
+        remote = self.list_objects(bucket, prefix + "/")
+        files = []
+        for root, _, names in os.walk(local_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, local_dir).replace("\\", "/")
+                files.append((path, f"{prefix}/{rel}"))
+
+        def job(path, key):
+            def upload():
+                if key in remote and self.same(path, *remote[key], bucket, key):
+                    return None
+                self.s3.upload_file(path, bucket, key, Config=self.config)
+                return os.path.getsize(path)
+            return upload
+
+        # largest first so one big file doesn't start last and run alone
+        files.sort(key=lambda f: os.path.getsize(f[0]), reverse=True)
+        return self._run("upload", [job(p, k) for p, k in files], len(files))
+
+    def download_prefix(self, bucket: str, prefix: str, local_dir: str) -> dict:
+        prefix = prefix.rstrip("/")
+        objects = [(key, size, etag) for key, (size, etag) in self.list_objects(bucket, prefix + "/").items()
+                   if not key.endswith("/")]   # skip "directory" placeholders
+
+        def job(key, size, etag):
+            def download():
+                dest = os.path.join(local_dir, key[len(prefix) + 1:])
+                if self.same(dest, size, etag, bucket, key):
+                    return None
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                self.s3.download_file(bucket, key, dest, Config=self.config)
+                return size
+            return download
+
+        objects.sort(key=lambda o: o[1], reverse=True)
+        return self._run("download", [job(*o) for o in objects], len(objects))
+
+
+def main():
+    p = argparse.ArgumentParser(description="Parallel S3 directory upload/download")
+    p.add_argument("--endpoint", default=os.getenv("S3_ENDPOINT", "minio-service.kubeflow.svc.cluster.local:9000"))
+    p.add_argument("--access_key", default=os.getenv("AWS_ACCESS_KEY_ID", "minio"))
+    p.add_argument("--secret_key", default=os.getenv("AWS_SECRET_ACCESS_KEY", "minio123"))
+    p.add_argument("--workers", type=int, default=8, help="files in flight")
+    p.add_argument("--part_concurrency", type=int, default=8, help="parts in flight per file")
+    p.add_argument("--chunk_mb", type=int, default=64, help="multipart threshold and part size")
+    p.add_argument("direction", choices=["upload", "download"])
+    p.add_argument("src")
+    p.add_argument("dst")
+    args = p.parse_args()
+
+    client = make_client(args.endpoint, args.access_key, args.secret_key,
+                         max_pool_connections=args.workers * args.part_concurrency)
+    xfer = S3Transfer(client, args.workers, args.part_concurrency, args.chunk_mb)
+    if args.direction == "upload":
+        bucket, prefix = parse_s3(args.dst)
+        xfer.upload_dir(args.src, bucket, prefix)
+    else:
+        bucket, prefix = parse_s3(args.src)
+        xfer.download_prefix(bucket, prefix, args.dst)
+
+
+if __name__ == "__main__":
+    main()
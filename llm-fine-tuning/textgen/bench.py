@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+bench.py
+
+Aggregate generation throughput of an OpenAI-compatible completion endpoint
+(this server, or the KServe huggingface predictor) under N concurrent
+streaming clients. Each client sends --requests completions back to back;
+time to first token and completion tokens/sec (one streamed chunk per token)
+are reported per concurrency level.
+
+Usage:
+    python3 bench.py --url http://localhost:8080 --concurrency 1,8,16 --max_tokens 64
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PROMPTS = [
+    "What is Arnav’s main profession?",
+    "Answer about the person described.\nWhat is the full name?",
+    "Roleplay: Introduce yourself in one line.",
+    "Where does Arnav live?",
+    "Name one of Arnav’s hobbies.",
+    "Answer about the person described.\nList 3 hobbies.",
+]
+
+
+def stream_one(session, url, model, prompt, max_tokens):
+    """(time to first token, completion tokens, seconds) for one streamed completion."""
+    body = {"model": model, "prompt": prompt, "max_tokens": max_tokens,
+            "temperature": 0.0, "stream": True}
+    t0 = time.perf_counter()
+    ttft, chunks = None, 0
+    with session.post(url, json=body, stream=True, timeout=600) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line.startswith(b"data: ") or line == b"data: [DONE]":
+                continue
+            choice = json.loads(line[6:])["choices"][0]
+            if choice["text"]:
+                chunks += 1
+                if ttft is None:
+                    ttft = time.perf_counter() - t0
+    return ttft or 0.0, chunks, time.perf_counter() - t0
+
+
+def run(url, model, concurrency, requests_per_client, max_tokens):
+    def client(c):
+        session = requests.Session()
+        return [stream_one(session, url, model, PROMPTS[(c + i) % len(PROMPTS)], max_tokens)
+                for i in range(requests_per_client)]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = [r for rs in pool.map(client, range(concurrency)) for r in rs]
+    elapsed = time.perf_counter() - t0
+    tokens = sum(r[1] for r in results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "completion_tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_sec": round(tokens / elapsed, 1),
+        "ttft_p50_ms": round(statistics.median(r[0] for r in results) * 1000, 1),
+        "latency_p50_ms": round(statistics.median(r[2] for r in results) * 1000, 1),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Concurrent streaming throughput benchmark")
+    p.add_argument("--url", default="http://localhost:8080")
+    p.add_argument("--model", default="tiny-sft")
+    p.add_argument("--concurrency", default="1,8,16", help="comma-separated client counts")
+    p.add_argument("--requests", type=int, default=4, help="completions per client")
+    p.add_argument("--max_tokens", type=int, default=64)
+    p.add_argument("--json_out", default="")
+    args = p.parse_args()
+
+    url = args.url.rstrip("/") + "/openai/v1/completions"
+    report = []
+    for c in [int(x) for x in args.concurrency.split(",") if x]:
+        result = run(url, args.model, c, args.requests, args.max_tokens)
+        report.append(result)
+        print(f"concurrency {c:>3}: {result['tokens_per_sec']:>8.1f} tokens/s  "
+              f"ttft p50 {result['ttft_p50_ms']:.0f} ms  latency p50 {result['latency_p50_ms']:.0f} ms")
+    if report and report[0]["concurrency"] == 1:
+        base = report[0]["tokens_per_sec"]
+        for r in report[1:]:
+            print(f"speedup x{r['concurrency']}: {r['tokens_per_sec'] / base:.1f}")
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# engine.py
+"""
+Iteration-level (continuous) batching for a HuggingFace causal LM on CPU.
+
+One thread owns the model and runs a decode loop. Every step it
+
+  1. admits waiting requests (up to MAX_BATCH_SIZE active): their prompts are
+     prefilled together and their KV entries joined onto the running batch
+  2. runs ONE forward pass for all active sequences (one new token each)
+  3. samples per sequence (greedy or temperature/top-p), streams the new text
+     to its request and retires sequences that hit EOS, a stop string or
+     max_tokens
+
+so a request never waits for the rest of the batch to finish, and a long
+generation never blocks new arrivals for more than a step.
+
+KV layout: one cache per layer shaped (batch, heads, seq, head_dim), every
+row right-aligned (left-padded), so each step appends a single column for all
+rows. `attention_mask` marks each row's real entries and `position_ids` come
+from its own token count, so padding never changes a row's output. Joining
+left-pads whichever side is shorter; retiring drops rows and trims columns
+that are padding for every remaining row.
+"""
+import queue
+import threading
+import time
+
+import torch
+import torch.nn.functional as F
+
+try:
+    from transformers import DynamicCache
+except ImportError:        # older transformers: legacy tuples only
+    DynamicCache = None
+
+
+class Request:
+    def __init__(self, prompt_ids, max_tokens, temperature=0.0, top_p=1.0, stop=(), emit=None):
+        self.prompt_ids = prompt_ids
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.stop = [s for s in stop if s]
+        self.emit = emit            # emit(text_delta, finish_reason or None), engine thread
+        self.generated = []
+        self.text = ""
+        self.cancelled = False
+        self.submitted = time.perf_counter()
+
+
+def legacy(past):
+    return past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+
+
+class Engine:
+    def __init__(self, model, tokenizer, max_batch_size=16, max_model_len=None):
+        self.model = model.eval()
+        self.tok = tokenizer
+        self.eos = tokenizer.eos_token_id
+        self.max_batch_size = max_batch_size
+        self.max_model_len = max_model_len or getattr(model.config, "n_positions", None) \
+            or getattr(model.config, "max_position_embeddings", 2048)
+        self.waiting = queue.Queue()
+        self.active = []            # Request per batch row
+        self.past = None            # tuple of (k, v) per layer, batch-major
+        self.mask = None            # (batch, seq) long
+        self.next_ids = None        # (batch, 1) token to feed at the next step
+        # models on the Cache API take a DynamicCache, older ones (GPT-2 before
+        # transformers 4.45) the legacy tuples this engine stores
+        self.cache_class = DynamicCache is not None and getattr(model, "_supports_cache_class", True)
+        self.steps = self.tokens = 0
+        self._thread = threading.Thread(target=self._loop, name="textgen-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, request: Request) -> None:
+        room = self.max_model_len - request.max_tokens
+        if len(request.prompt_ids) > room:
+            request.prompt_ids = request.prompt_ids[-max(1, room):]
+        self.waiting.put(request)
+
+    # ---- model calls ----
+
+    def _forward(self, input_ids, mask, position_ids, past):
+        if past is not None and self.cache_class:
+            past = DynamicCache.from_legacy_cache(past)
+        out = self.model(input_ids=input_ids, attention_mask=mask, position_ids=position_ids,
+                         past_key_values=past, use_cache=True)
+        return out.logits[:, -1, :], legacy(out.past_key_values)
+
+    def _prefill(self, requests):
+        """Left-padded batch prefill; returns (last logits, past, mask)."""
+        width = max(len(r.prompt_ids) for r in requests)
+        pad = self.tok.pad_token_id if self.tok.pad_token_id is not None else self.eos
+        ids = torch.full((len(requests), width), pad, dtype=torch.long)
+        mask = torch.zeros((len(requests), width), dtype=torch.long)
+        for i, r in enumerate(requests):
+            n = len(r.prompt_ids)
+            ids[i, width - n:] = torch.tensor(r.prompt_ids)
+            mask[i, width - n:] = 1
+        position_ids = (mask.cumsum(-1) - 1).clamp(min=0)
+        logits, past = self._forward(ids, mask, position_ids, None)
+        return logits, past, mask
+
+    # ---- batch bookkeeping ----
+
+    @staticmethod
+    def _pad_past(past, n):
+        return tuple((F.pad(k, (0, 0, n, 0)), F.pad(v, (0, 0, n, 0))) for k, v in past)
+
+    def _join(self, requests, past, mask, next_ids):
+        if self.past is None:
+            self.active, self.past, self.mask, self.next_ids = list(requests), past, mask, next_ids
+            return
+        a, b = self.mask.shape[1], mask.shape[1]
+        if a < b:
+            self.past, self.mask = self._pad_past(self.past, b - a), F.pad(self.mask, (b - a, 0))
+        elif b < a:
+            past, mask = self._pad_past(past, a - b), F.pad(mask, (a - b, 0))
+        self.past = tuple((torch.cat([k0, k1]), torch.cat([v0, v1]))
+                          for (k0, v0), (k1, v1) in zip(self.past, past))
+        self.mask = torch.cat([self.mask, mask])
+        self.next_ids = torch.cat([self.next_ids, next_ids])
+        self.active.extend(requests)
+
+    def _retire(self, keep):
+        if not keep:
+            self.active, self.past, self.mask, self.next_ids = [], None, None, None
+            return
+        idx = torch.tensor(keep)
+        self.active = [self.active[i] for i in keep]
+        mask = self.mask.index_select(0, idx)
+        # columns that are padding in every remaining row
+        trim = int((mask.cumsum(-1) == 0).sum(-1).min())
+        self.mask = mask[:, trim:]
+        self.past = tuple((k.index_select(0, idx)[:, :, trim:], v.index_select(0, idx)[:, :, trim:])
+                          for k, v in self.past)
+        self.next_ids = self.next_ids.index_select(0, idx)
+
+    # ---- sampling / streaming ----
+
+    def _sample(self, logits, requests):
+        temps = torch.tensor([r.temperature for r in requests], dtype=logits.dtype)
+        greedy = logits.argmax(-1)
+        if not bool((temps > 0).any()):
+            return greedy
+        probs = torch.softmax(logits / temps.clamp(min=1e-5).unsqueeze(-1), dim=-1)
+        top_p = torch.tensor([r.top_p for r in requests], dtype=logits.dtype).unsqueeze(-1)
+        sorted_probs, order = probs.sort(-1, descending=True)
+        # keep the smallest prefix whose mass reaches top_p (always at least one token)
+        drop = sorted_probs.cumsum(-1) - sorted_probs > top_p
+        sorted_probs = sorted_probs.masked_fill(drop, 0.0)
+        sampled = order.gather(-1, torch.multinomial(sorted_probs, 1)).squeeze(-1)
+        return torch.where(temps > 0, sampled, greedy)
+
+    def _advance(self, r, token):
+        """Record one token for `r`, stream its text; returns finish_reason or None."""
+        if token == self.eos:
+            r.emit("", "stop")
+            return "stop"
+        r.generated.append(token)
+        text = self.tok.decode(r.generated, skip_special_tokens=True)
+        finish = None
+        for s in r.stop:
+            at = text.find(s, max(0, len(r.text) - len(s)))
+            if at != -1:
+                text, finish = text[:at], "stop"
+                break
+        if finish is None and len(r.generated) >= r.max_tokens:
+            finish = "length"
+        # hold back a trailing partial UTF-8 sequence until the next token completes it
+        if finish is None and text.endswith("�"):
+            return None
+        delta, r.text = text[len(r.text):], text
+        r.emit(delta, finish)
+        return finish
+
+    # ---- loop ----
+
+    def _admit(self):
+        new = []
+        block = not self.active
+        while len(self.active) + len(new) < self.max_batch_size:
+            try:
+                r = self.waiting.get(block=block and not new, timeout=None)
+            except queue.Empty:
+                break
+            if not r.cancelled:
+                new.append(r)
+        if not new:
+            return
+        try:
+            logits, past, mask = self._prefill(new)
+            first = self._sample(logits, new)
+        except Exception as e:
+            for r in new:
+                r.emit("", f"error: {e}")
+            return
+        keep = [i for i, r in enumerate(new) if self._advance(r, int(first[i])) is None]
+        if not keep:
+            return
+        idx = torch.tensor(keep)
+        past = tuple((k.index_select(0, idx), v.index_select(0, idx)) for k, v in past)
+        self._join([new[i] for i in keep], past, mask.index_select(0, idx),
+                   first.index_select(0, idx).unsqueeze(-1))
+
+    def _step(self):
+        self.mask = F.pad(self.mask, (0, 1), value=1)
+        position_ids = (self.mask.sum(-1, keepdim=True) - 1)
+        logits, self.past = self._forward(self.next_ids, self.mask, position_ids, self.past)
+        tokens = self._sample(logits, self.active)
+        self.steps += 1
+        self.tokens += len(self.active)
+        keep = []
+        for i, r in enumerate(self.active):
+            if r.cancelled or self._advance(r, int(tokens[i])) is not None:
+                continue
+            keep.append(i)
+        self.next_ids = tokens.unsqueeze(-1)
+        if len(keep) < len(self.active):
+            self._retire(keep)
+
+    def _loop(self):
+        with torch.inference_mode():
+            while True:
+                try:
+                    self._admit()
+                    if self.active:
+                        self._step()
+                except Exception as e:          # fail the batch, keep serving
+                    for r in self.active:
+                        r.emit("", f"error: {e}")
+                    self._retire([])
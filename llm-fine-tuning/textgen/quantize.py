@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# quantize.py
+"""
+Dynamic int8 export of the merged tiny-sft model for CPU serving.
+
+Linear weights are stored as int8 with a per-tensor scale; activations are
+quantized on the fly at each matmul (torch dynamic quantization, fbgemm /
+qnnpack kernels). Embeddings, layer norms and, by default, the LM head stay
+fp32. The LM head is tied to the token embedding, and quantizing it costs
+the most accuracy.
+
+GPT-2 style models implement their projections as transformers' Conv1D
+(an nn.Linear with a transposed weight), which quantize_dynamic does not
+recognise, so those are swapped for nn.Linear first.
+
+Layout written by `save_int8` (config + tokenizer as usual, plus):
+
+    model_int8.pt        quantized state_dict (loads with weights_only=True)
+    quantization.json    format, version, quantize_lm_head, torch version
+
+`load_model(path)` returns the int8 model for such a directory and the
+plain fp32 model for any other checkpoint, so server.py serves either.
+
+Standalone:
+    python3 quantize.py --merged_dir /tmp/tiny-sft-merged --out_dir /tmp/tiny-sft-int8
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+from torch import nn
+
+FORMAT = "torch-dynamic-int8"
+VERSION = 1
+MANIFEST = "quantization.json"
+WEIGHTS = "model_int8.pt"
+
+
+def linearize(model: nn.Module) -> nn.Module:
+    """Replace transformers' Conv1D layers with equivalent nn.Linear, in place."""
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in list(model.named_children()):
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            # meta: no init for weights that are replaced on the next line
+            linear = nn.Linear(in_features, out_features, bias=child.bias is not None, device="meta")
+            linear.weight = nn.Parameter(child.weight.detach().t().contiguous())
+            if child.bias is not None:
+                linear.bias = nn.Parameter(child.bias.detach().clone())
+            setattr(model, name, linear)
+        else:
+            linearize(child)
+    return model
+
+
+def targets(model: nn.Module, quantize_lm_head: bool):
+    return {name for name, m in model.named_modules()
+            if isinstance(m, nn.Linear) and (quantize_lm_head or name != "lm_head")}
+
+
+def quantize(model: nn.Module, quantize_lm_head: bool = False) -> nn.Module:
+    model = linearize(model.eval())
+    # a set of qualified names limits quantization to exactly these modules
+    return torch.ao.quantization.quantize_dynamic(model, targets(model, quantize_lm_head),
+                                                  dtype=torch.qint8)
+
+
+def int8_shells(model: nn.Module, quantize_lm_head: bool) -> nn.Module:
+    """
+    Swap the target Linears for empty dynamic-int8 ones, ready for
+    load_state_dict. Much cheaper than quantizing weights that are about
+    to be overwritten.
+    """
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    model = linearize(model.eval())
+    for name in targets(model, quantize_lm_head):
+        parent_name, _, child = name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        old = getattr(parent, child)
+        setattr(parent, child, DynamicLinear(old.in_features, old.out_features,
+                                             bias_=old.bias is not None, dtype=torch.qint8))
+    return model
+
+
+def is_int8(path: str) -> bool:
+    return os.path.exists(os.path.join(path, MANIFEST))
+
+
+def save_int8(model, tokenizer, out_dir: str, quantize_lm_head: bool) -> None:
+    """Write the quantized model; the manifest goes last and marks it complete."""
+    os.makedirs(out_dir, exist_ok=True)
+    model.config.save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+    torch.save(model.state_dict(), os.path.join(out_dir, WEIGHTS))
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump({"format": FORMAT, "version": VERSION, "quantize_lm_head": quantize_lm_head,
+                   "torch": torch.__version__}, f, indent=2)
+
+
+def load_model(path: str):
+    """An int8 directory written by save_int8, else a regular HF checkpoint (fp32)."""
+    from transformers import AutoConfig, AutoModelForCausalLM
+    from transformers.modeling_utils import no_init_weights
+
+    if not is_int8(path):
+        return AutoModelForCausalLM.from_pretrained(path, torch_dtype=torch.float32).eval()
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+        raise ValueError(f"{path}: unsupported quantization manifest {manifest}")
+    # every weight comes from the state dict: skip random init
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(AutoConfig.from_pretrained(path))
+    model = int8_shells(model, manifest["quantize_lm_head"])
+    state = torch.load(os.path.join(path, WEIGHTS), map_location="cpu", weights_only=True)
+    model.load_state_dict(state)
+    if not manifest["quantize_lm_head"]:
+        model.tie_weights()
+    return model.eval()
+
+
+def dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def to_prompt(ex):
+    instr = ex.get("instruction", "")
+    inp   = ex.get("input", "")
+    return (instr + ("\n" + inp if inp else "")).strip()
+
+
+def generate_all(model, tok, val, max_new_tokens):
+    """Greedy completions (token ids) per example and the time spent generating."""
+    outputs = []
+    t0 = time.perf_counter()
+    with torch.inference_mode():
+        for ex in val:
+            ids = tok(to_prompt(ex), return_tensors="pt")
+            out = model.generate(**ids, max_new_tokens=max_new_tokens, do_sample=False,
+                                 pad_token_id=tok.pad_token_id or tok.eos_token_id)
+            outputs.append(out[0, ids["input_ids"].shape[1]:].tolist())
+    return outputs, time.perf_counter() - t0
+
+
+def compare(fp32_dir: str, int8_dir: str, val, max_new_tokens: int = 48) -> dict:
+    """
+    Parity and cost of the int8 copy against fp32 on the validation examples:
+    accuracy (same rule as eval_simple_accuracy), agreement of the greedy
+    completions, load time, generation latency and size on disk.
+    """
+    from transformers import AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(fp32_dir)
+    report = {"examples": len(val), "max_new_tokens": max_new_tokens}
+    completions = {}
+    for label, path in (("fp32", fp32_dir), ("int8", int8_dir)):
+        t0 = time.perf_counter()
+        model = load_model(path)
+        load_s = time.perf_counter() - t0
+        generate_all(model, tok, val[:1], 4)        # warm-up: kernels, allocator
+        outputs, gen_s = generate_all(model, tok, val, max_new_tokens)
+        texts = [tok.decode(o, skip_special_tokens=True) for o in outputs]
+        correct = sum(ex["output"].lower() in (to_prompt(ex) + t).lower() for ex, t in zip(val, texts))
+        n_tokens = sum(len(o) for o in outputs)
+        completions[label] = outputs
+        report[label] = {
+            "size_mb": round(dir_bytes(path) / 2**20, 2),
+            "load_seconds": round(load_s, 3),
+            "generate_seconds": round(gen_s, 3),
+            "ms_per_example": round(gen_s / max(1, len(val)) * 1000, 1),
+            "tokens_per_sec": round(n_tokens / gen_s, 1) if gen_s > 0 else 0.0,
+            "accuracy": round(correct / max(1, len(val)), 4),
+        }
+        del model
+
+    same = agree = total = 0
+    for a, b in zip(completions["fp32"], completions["int8"]):
+        same += a == b
+        agree += sum(x == y for x, y in zip(a, b))
+        total += max(len(a), len(b))
+    f, q = report["fp32"], report["int8"]
+    report["parity"] = {
+        "exact_match": round(same / max(1, len(val)), 4),
+        "token_agreement": round(agree / max(1, total), 4),
+        "accuracy_delta": round(q["accuracy"] - f["accuracy"], 4),
+    }
+    report["ratio"] = {
+        "size": round(q["size_mb"] / f["size_mb"], 3) if f["size_mb"] else None,
+        "load": round(q["load_seconds"] / f["load_seconds"], 3) if f["load_seconds"] else None,
+        "speedup": round(f["generate_seconds"] / q["generate_seconds"], 2) if q["generate_seconds"] else None,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a dynamic int8 copy of a merged causal LM")
+    parser.add_argument('--merged_dir', type=str, required=True, help="fp32 merged model directory")
+    parser.add_argument('--out_dir',    type=str, required=True, help="where to write the int8 copy")
+    parser.add_argument('--val_jsonl',  type=str, default="",
+                        help="validation set for the parity/latency report (report.json in out_dir)")
+    parser.add_argument('--quantize_lm_head', action='store_true')
+    parser.add_argument('--max_new_tokens', type=int, default=48)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(args.merged_dir)
+    model = quantize(load_model(args.merged_dir), args.quantize_lm_head)
+    save_int8(model, tok, args.out_dir, args.quantize_lm_head)
+    print(f"wrote int8 model to {args.out_dir}: {dir_bytes(args.out_dir) / 2**20:.1f} MB "
+          f"(fp32 {dir_bytes(args.merged_dir) / 2**20:.1f} MB)")
+
+    if args.val_jsonl:
+        with open(args.val_jsonl, encoding="utf-8") as f:
+            val = [json.loads(line) for line in f if line.strip()]
+        report = compare(args.merged_dir, args.out_dir, val, args.max_new_tokens)
+        with open(os.path.join(args.out_dir, "report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# server.py
+"""
+Continuous-batching text-generation predictor for the merged tiny-sft model
+(models/tiny-sft-merged, or its int8 copy models/tiny-sft-int8), a drop-in for the KServe
+huggingface backend's OpenAI-compatible completion route:
+
+    POST /openai/v1/completions   {"model", "prompt", "max_tokens", "temperature",
+                                   "top_p", "stop", "stream"}
+    GET  /openai/v1/models
+    GET  /healthz                 active/waiting requests, decode steps, tokens
+
+With "stream": true tokens come back as server-sent events, one
+`data: {...text_completion chunk...}` per new piece of text, then
+`data: [DONE]`. All requests share one model and one decode batch (engine.py).
+
+Local run (from this directory):
+    MODEL_PATH=/tmp/tiny-sft-int8 uvicorn server:app --port 8080
+
+<repo>/common (cpu_quota) is put on sys.path below; the image copies it next
+to this script.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+import torch
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from transformers import AutoTokenizer
+
+# shared helpers from <repo>/common; in the images they are copied next to this script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from cpu_quota import cpu_quota  # noqa: E402
+from engine import Engine, Request as GenRequest  # noqa: E402
+from quantize import is_int8, load_model  # noqa: E402
+
+# KServe's storage initializer puts storageUri here: the fp32 merged model or
+# its int8 copy (quantize.py), detected by quantization.json
+MODEL_PATH   = os.getenv("MODEL_PATH", "/mnt/models")
+MODEL_NAME   = os.getenv("MODEL_NAME", "tiny-sft")
+ROUTE_PREFIX = "/" + os.getenv("KSERVE_OPENAI_ROUTE_PREFIX", "openai").strip("/")
+
+# decode batch: sequences generated together, one token each per step
+MAX_BATCH_SIZE     = int(os.getenv("MAX_BATCH_SIZE", "16"))
+MAX_MODEL_LEN      = int(os.getenv("MAX_MODEL_LEN", "0"))       # 0 = the model's context size
+DEFAULT_MAX_TOKENS = int(os.getenv("DEFAULT_MAX_TOKENS", "16"))
+TORCH_THREADS      = os.getenv("TORCH_THREADS", "auto").strip().lower()
+
+
+# intra-op threads matched to the pod's CPU limit, not the node's core count
+torch.set_num_threads(cpu_quota() if TORCH_THREADS == "auto" else int(TORCH_THREADS))
+
+# load once
+t0 = time.perf_counter()
+tok = AutoTokenizer.from_pretrained(MODEL_PATH)
+model = load_model(MODEL_PATH)
+engine = Engine(model, tok, MAX_BATCH_SIZE, MAX_MODEL_LEN or None)
+print(f"{'int8' if is_int8(MODEL_PATH) else 'fp32'} model loaded from {MODEL_PATH} "
+      f"in {(time.perf_counter() - t0) * 1000:.1f} ms, "
+      f"max_batch_size={MAX_BATCH_SIZE}, threads={torch.get_num_threads()}")
+
+app = FastAPI()
+
+
+def parse(body: dict) -> GenRequest:
+    prompt = body.get("prompt", "")
+    if isinstance(prompt, list):
+        if len(prompt) != 1:
+            raise HTTPException(400, "one prompt per request")
+        prompt = prompt[0]
+    if not isinstance(prompt, str):
+        raise HTTPException(400, "prompt must be a string")
+    stop = body.get("stop") or []
+    if isinstance(stop, str):
+        stop = [stop]
+    try:
+        max_tokens = int(body.get("max_tokens") or DEFAULT_MAX_TOKENS)
+        temperature = float(body.get("temperature", 1.0))
+        top_p = float(body.get("top_p", 1.0))
+    except (TypeError, ValueError):
+        raise HTTPException(400, "max_tokens, temperature and top_p must be numbers")
+    if max_tokens < 1 or max_tokens >= engine.max_model_len:
+        raise HTTPException(400, f"max_tokens must be in [1, {engine.max_model_len})")
+    ids = tok(prompt)["input_ids"] or [engine.eos]
+    return GenRequest(ids, max_tokens, temperature, top_p, stop)
+
+
+def chunk(cid, created, text, finish):
+    return {"id": cid, "object": "text_completion", "created": created, "model": MODEL_NAME,
+            "choices": [{"index": 0, "text": text, "logprobs": None, "finish_reason": finish}]}
+
+
+@app.post(ROUTE_PREFIX + "/v1/completions")
+async def completions(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "invalid JSON")
+    gen = parse(body)
+    cid, created = f"cmpl-{uuid.uuid4().hex}", int(time.time())
+
+    # the engine thread hands (delta, finish) pieces to this request's event loop
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+    gen.emit = lambda delta, finish: loop.call_soon_threadsafe(pieces.put_nowait, (delta, finish))
+    engine.submit(gen)
+
+    async def events():
+        try:
+            while True:
+                delta, finish = await pieces.get()
+                if finish and finish.startswith("error"):
+                    yield f"data: {json.dumps({'error': {'message': finish}})}\n\n"
+                    break
+                yield f"data: {json.dumps(chunk(cid, created, delta, finish))}\n\n"
+                if finish:
+                    break
+            yield "data: [DONE]\n\n"
+        finally:
+            gen.cancelled = True        # client went away: free the batch slot
+
+    if body.get("stream"):
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    try:
+        text, finish = [], None
+        while finish is None:
+            delta, finish = await pieces.get()
+            text.append(delta)
+    finally:
+        gen.cancelled = True
+    if finish.startswith("error"):
+        raise HTTPException(500, finish)
+    prompt_tokens, completion_tokens = len(gen.prompt_ids), len(gen.generated)
+    result = chunk(cid, created, "".join(text), finish)
+    result["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                       "total_tokens": prompt_tokens + completion_tokens}
+    return result
+
+
+@app.get(ROUTE_PREFIX + "/v1/models")
+def models():
+    return {"object": "list", "data": [{"id": MODEL_NAME, "object": "model", "owned_by": "kserve"}]}
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok", "active": len(engine.active), "waiting": engine.waiting.qsize(),
+            "steps": engine.steps, "tokens": engine.tokens}
@@ -0,0 +1,241 @@
+# proxy.py
+"""
+Caching proxy for the OpenAI-compatible completion route of the KServe
+huggingface backend (llm-serving/google-flan-t5-small, llm-fine-tuning/serve.yaml).
+
+Deterministic completions (temperature 0, not streamed) are cached and
+concurrent identical ones are coalesced:
+
+    key = sha256(canonical JSON of model, prompt and every sampling parameter)
+
+Canonical form: omitted parameters take their OpenAI default (top_p 1,
+max_tokens 16, ...), integral numbers are written as ints (0 and 0.0, 1 and
+1.0 are one key) and a single stop string is a one-element list.
+
+  * hit        the stored response body is returned, the model is not called
+  * coalesced  an identical request is already in flight; wait for its result
+               (single-flight), so N concurrent copies cost one generation
+  * miss       forward to the backend; a 200 response is stored
+  * bypass     sampled or streamed requests, and every other route under
+               /openai, pass straight through
+
+The store is an in-process LRU bounded by CACHE_MAX_ENTRIES and
+CACHE_MAX_BYTES, each entry expiring after CACHE_TTL_SECONDS. Cached
+responses keep the backend's original "id" and "created" fields.
+
+GET /metrics (Prometheus):
+    completion_cache_requests_total{result}  hit | coalesced | miss | bypass
+    completion_cache_evictions_total{reason} lru | ttl
+    completion_cache_entries, completion_cache_bytes
+    completion_backend_seconds               backend call latency
+    hit rate: sum(rate(...{result=~"hit|coalesced"}[5m])) / sum(rate(...{result!="bypass"}[5m]))
+
+Local run against the stub backend:
+    uvicorn stub_backend:app --port 8081 &
+    BACKEND_URL=http://localhost:8081 uvicorn proxy:app --port 8080
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+BACKEND_URL     = os.getenv("BACKEND_URL", "http://localhost:8081").rstrip("/")
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "300"))
+ROUTE_PREFIX    = "/" + os.getenv("KSERVE_OPENAI_ROUTE_PREFIX", "openai").strip("/")
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES   = int(os.getenv("CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+
+# fields that change the generated text; anything else (user, stream, ...) is not part of the key
+KEY_FIELDS = ("model", "prompt", "suffix", "max_tokens", "temperature", "top_p", "top_k", "n",
+              "best_of", "stop", "presence_penalty", "frequency_penalty", "repetition_penalty",
+              "logit_bias", "logprobs", "echo", "seed")
+
+# OpenAI completion defaults: an omitted field and its default are one key
+KEY_DEFAULTS = {"max_tokens": 16, "temperature": 1, "top_p": 1, "n": 1, "best_of": 1,
+                "presence_penalty": 0, "frequency_penalty": 0, "echo": False}
+
+# forwarded in both directions; hop-by-hop and length headers are recomputed
+DROP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding",
+                "content-encoding", "upgrade", "te", "trailer", "proxy-authorization"}
+
+REQUESTS   = Counter("completion_cache_requests", "Completion requests by cache result", ["result"])
+EVICTIONS  = Counter("completion_cache_evictions", "Cache evictions", ["reason"])
+ENTRIES    = Gauge("completion_cache_entries", "Cached completions")
+BYTES      = Gauge("completion_cache_bytes", "Cached response bytes")
+BACKEND_S  = Histogram("completion_backend_seconds", "Backend completion latency",
+                       buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120, 300))
+
+
+class TTLCache:
+    """LRU of key -> (expires_at, status, headers, body), bounded by count and bytes."""
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            self._pop(key, "ttl")
+            return None
+        self._data.move_to_end(key)
+        return item[1:]
+
+    def put(self, key, status, headers, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._data:
+            self._pop(key, None)
+        self._data[key] = (time.monotonic() + self.ttl, status, headers, body)
+        self.nbytes += len(body)
+        while len(self._data) > self.max_entries or self.nbytes > self.max_bytes:
+            self._pop(next(iter(self._data)), "lru")
+        ENTRIES.set(len(self._data))
+        BYTES.set(self.nbytes)
+
+    def _pop(self, key, reason):
+        self.nbytes -= len(self._data.pop(key)[3])
+        if reason:
+            EVICTIONS.labels(reason).inc()
+        ENTRIES.set(len(self._data))
+        BYTES.set(self.nbytes)
+
+
+cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_SECONDS)
+inflight = {}       # key -> Task returning (status, headers, body), for single-flight
+client = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global client
+    client = httpx.AsyncClient(base_url=BACKEND_URL, timeout=BACKEND_TIMEOUT,
+                               limits=httpx.Limits(max_connections=64, max_keepalive_connections=16))
+    yield
+    await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def canonical(value):
+    """Integral floats as ints, recursively (0.0 -> 0, keeps large int seeds exact)."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, list):
+        return [canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {k: canonical(v) for k, v in value.items()}
+    return value
+
+
+def cache_key(body: dict):
+    """Key for a cacheable request, None if the output is sampled or streamed."""
+    if body.get("stream") or body.get("temperature", 1.0) != 0:
+        return None
+    fields = {k: canonical(body[k] if body.get(k) is not None else KEY_DEFAULTS.get(k))
+              for k in KEY_FIELDS}
+    if isinstance(fields["stop"], str):
+        fields["stop"] = [fields["stop"]]
+    fields["stop"] = fields["stop"] or None
+    canonical_json = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical_json.encode()).hexdigest()
+
+
+def forward_headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() not in DROP_HEADERS}
+
+
+async def call_backend(method, path, headers, content):
+    t0 = time.perf_counter()
+    try:
+        r = await client.request(method, path, headers=headers, content=content)
+        return r.status_code, forward_headers(r.headers), r.content
+    except httpx.HTTPError as e:
+        body = json.dumps({"error": {"message": f"backend unavailable: {type(e).__name__}",
+                                     "type": "proxy_error"}}).encode()
+        return 502, {"content-type": "application/json"}, body
+    finally:
+        BACKEND_S.observe(time.perf_counter() - t0)
+
+
+def respond(result, cache_status):
+    status, headers, body = result
+    headers = dict(headers)
+    headers["x-cache"] = cache_status
+    return Response(content=body, status_code=status, headers=headers)
+
+
+@app.post(ROUTE_PREFIX + "/v1/completions")
+async def completions(request: Request):
+    raw = await request.body()
+    try:
+        body = json.loads(raw)
+        key = cache_key(body) if isinstance(body, dict) else None
+    except ValueError:
+        key = None      # let the backend produce the error
+    headers = forward_headers(request.headers)
+    path = request.url.path
+
+    if key is None:
+        REQUESTS.labels("bypass").inc()
+        return respond(await call_backend("POST", path, headers, raw), "BYPASS")
+
+    hit = cache.get(key)
+    if hit is not None:
+        REQUESTS.labels("hit").inc()
+        return respond(hit, "HIT")
+
+    pending = inflight.get(key)
+    if pending is not None:
+        REQUESTS.labels("coalesced").inc()
+        return respond(await asyncio.shield(pending), "COALESCED")
+
+    REQUESTS.labels("miss").inc()
+
+    async def fetch():
+        try:
+            result = await call_backend("POST", path, headers, raw)
+            if result[0] == 200:
+                cache.put(key, *result)
+            return result
+        finally:
+            inflight.pop(key, None)
+
+    # a task of its own, shielded: the leader's client disconnecting must not
+    # cancel the backend call the followers are waiting on
+    inflight[key] = task = asyncio.create_task(fetch())
+    return respond(await asyncio.shield(task), "MISS")
+
+
+@app.api_route(ROUTE_PREFIX + "/{path:path}", methods=["GET", "POST"])
+async def passthrough(path: str, request: Request):
+    target = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    result = await call_backend(request.method, target, forward_headers(request.headers),
+                                await request.body())
+    return respond(result, "BYPASS")
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok", "backend": BACKEND_URL, "entries": len(cache._data),
+            "bytes": cache.nbytes, "inflight": len(inflight)}
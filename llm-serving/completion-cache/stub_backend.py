@@ -0,0 +1,48 @@
+# stub_backend.py
+"""
+Stand-in for the KServe huggingface backend's /openai/v1/completions, for
+exercising proxy.py without a model: sleeps STUB_DELAY_S, echoes the prompt
+and counts the generations it was asked for (GET /calls).
+
+    uvicorn stub_backend:app --port 8081
+"""
+import asyncio
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+
+STUB_DELAY_S = float(os.getenv("STUB_DELAY_S", "0.5"))
+
+app = FastAPI()
+calls = 0
+
+
+@app.post("/openai/v1/completions")
+async def completions(request: Request):
+    global calls
+    calls += 1
+    body = await request.json()
+    await asyncio.sleep(STUB_DELAY_S)
+    prompt = body.get("prompt", "")
+    return {
+        "id": f"cmpl-{uuid.uuid4().hex}",
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "text": f"echo: {prompt}"[:body.get("max_tokens", 16) * 4],
+                     "logprobs": None, "finish_reason": "length"}],
+        "usage": {"prompt_tokens": len(str(prompt).split()), "completion_tokens": 0,
+                  "total_tokens": len(str(prompt).split())},
+    }
+
+
+@app.get("/openai/v1/models")
+def models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+
+@app.get("/calls")
+def get_calls():
+    return {"calls": calls}